@@ -1,9 +1,8 @@
-from multiprocessing import Process, Queue
 from pyqtgraph.Qt import QtWidgets
 import sys
 
 from adapta.controller import Window
-from adapta.model.beatdetection import BeatProcessor, Notifier
+from adapta.model.beatdetection import BeatProcessor, Notifier, Scheduler
 from adapta.model.data import Mix
 from adapta.model.playback import Player
 from adapta.util import load
@@ -25,19 +24,16 @@ def main(*args):
     if len(args) >= 1:
         load(args[0])
 
-    todo = Queue()
-    results = Queue()
-    processor = BeatProcessor(todo, results)
-    process = Process(target=processor.run, daemon=True)
-    process.start()
+    scheduler = Scheduler(BeatProcessor())
 
     app = QtWidgets.QApplication(args)
 
-    notifier = Notifier(results)
+    notifier = Notifier(scheduler)
     notifier.create_thread()
 
     Mix().create_thread()
     Stream().create_thread()
+    Stream().set_buffer(Player().buffer)
 
     Window().insert_widget(Plot())
     Window().show()
@@ -55,25 +51,31 @@ def main(*args):
     connect(Window().sig_skip_backward, Player().previous_track)
     # other
     connect(Window().sig_render_to, Mix().render)
+    # aborting must not wait for the mix thread, which is busy rendering
+    connect(Window().sig_abort_render, lambda: Mix().abort_render())
 
     # Mix
     connect(Mix().sig_loaded, Window().enable_controls)
     connect(Mix().sig_loaded, Player().update)
     connect(Mix().sig_segment, Player().receive)
+    connect(Mix().sig_invalidated, Player().invalidate)
+    connect(Mix().sig_progress, Window().set_render_progress)
+    connect(Mix().sig_rendered, Window().finish_render)
 
-    connect(Mix().sig_request_beats, todo.put_nowait)
+    connect(Mix().sig_request_beats, scheduler.schedule)
     connect(Mix().sig_request_beats, notifier.run)
     connect(notifier.sig_send, Mix().receive_beats)
 
-    connect(Mix().sig_updated, Player()._request)
+    connect(Mix().sig_updated, Player().refresh)
     connect(Mix().sig_updated, Plot().update)
 
     # Player
     connect(Player().sig_request, Mix().send_segment)
+    connect(Player().sig_cancel, Mix().cancel)
     connect(Player().sig_play, Stream().play)
     connect(Player().sig_position, Plot().move_cursor_to,
             lambda x: x() / Mix().sample_rate)
-    connect(Player().sig_state, Stream().pause)
+    connect(Player().sig_state, Stream().set_state)
     connect(Player().sig_state, Window().set_play_icon, lambda x: not x())
 
     # Stream
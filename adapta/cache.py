@@ -0,0 +1,60 @@
+import argparse
+import sys
+
+from adapta.model.beatdetection.activationcache import ActivationCache
+from adapta.model.beatdetection.beatcache import BeatCache
+from adapta.model.data.audiocache import AudioCache
+from adapta.util import load
+
+
+CACHES = {'audio': AudioCache,
+          'activations': ActivationCache,
+          'beats': BeatCache}
+
+
+def info(cache):
+    """Print a summary of the entries of a cache."""
+    entries = cache.entries()
+    total = sum(size for _, size, _ in entries)
+    print('directory: {}'.format(cache.root))
+    print('enabled:   {}'.format(cache.enabled))
+    print('entries:   {}'.format(len(entries)))
+    print('size:      {:.1f} / {} MB'.format(total / 1024 ** 2, cache.size))
+
+
+def purge(cache):
+    """Remove all entries of a cache."""
+    num_entries = len(cache.entries())
+    cache.clear()
+    print('removed {} entries from {}'.format(num_entries, cache.root))
+
+
+def main(*args):
+    if len(args) == 0:
+        args = sys.argv[1:]
+
+    parser = argparse.ArgumentParser(
+        prog='adapta-cache', description='Inspect or purge the Adapta caches.')
+    parser.add_argument('command', choices=['info', 'purge'])
+    parser.add_argument('caches', nargs='*', metavar='cache',
+                        help='the caches to handle, any of {} '
+                        '(default: all)'.format(', '.join(CACHES)))
+    parser.add_argument('-s', '--settings', help='path to a settings file')
+    args = parser.parse_args(args)
+    for name in args.caches:
+        if name not in CACHES:
+            parser.error('unknown cache: {}'.format(name))
+
+    if args.settings is not None:
+        load(args.settings)
+
+    command = {'info': info, 'purge': purge}[args.command]
+    for name in args.caches or CACHES:
+        print('[{}]'.format(name))
+        command(CACHES[name]())
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -35,9 +35,11 @@ class Window(QtWidgets.QMainWindow):
     sig_skip_forward = QtCore.Signal()
     sig_load = QtCore.Signal(str)
     sig_render_to = QtCore.Signal(str)
+    sig_abort_render = QtCore.Signal()
 
     def __init__(self):
         super().__init__()
+        self._render_dialog = None
         self.load_icons()
         self.init_ui()
 
@@ -162,8 +164,37 @@ class Window(QtWidgets.QMainWindow):
         path, _ = QtWidgets.QFileDialog.getSaveFileName(
             self, 'Render', filter='*.wav')
         if path:
+            # show the progress until rendering is finished or aborted
+            dialog = QtWidgets.QProgressDialog(
+                'Rendering mix...', 'Cancel', 0, 0, self)
+            dialog.setWindowTitle('Render')
+            dialog.setWindowModality(QtCore.Qt.WindowModal)
+            dialog.setMinimumDuration(0)
+            dialog.setAutoClose(False)
+            dialog.setAutoReset(False)
+            dialog.canceled.connect(self.sig_abort_render.emit)
+            self._render_dialog = dialog
             self.sig_render_to.emit(path)
 
+    def set_render_progress(self, num_rendered, num_segments):
+        """Updates the progress shown while rendering the mix.
+
+        """
+
+        if self._render_dialog is not None:
+            self._render_dialog.setMaximum(num_segments)
+            self._render_dialog.setValue(num_rendered)
+
+    def finish_render(self, completed=True):
+        """Closes the progress shown while rendering the mix.
+
+        """
+
+        if self._render_dialog is not None:
+            self._render_dialog.canceled.disconnect()
+            self._render_dialog.close()
+            self._render_dialog = None
+
     def enable_controls(self):
         """Enables the playback controls.
 
@@ -1,5 +1,5 @@
 from adapta.model.automation.automation import (
-    parse, Automation, PerSampleAutomation)
+    parse, changes, Automation, Envelope, PerSampleAutomation)
 from adapta.model.automation.equalizer import Equalizer
 from adapta.model.automation.tempo import Tempo
 from adapta.model.automation.volume import Volume
@@ -2,7 +2,7 @@ import copy
 import csv
 import numpy as np
 
-from adapta.util import expspace, isarray
+from adapta.util import expinterp, expspace, isarray, linspace
 
 
 def parse(path):
@@ -31,6 +31,42 @@ def parse(path):
     return result
 
 
+def changes(old, new):
+    """Determines the segments affected by changing the nodes of an
+    automation specification.
+
+    Parameters
+    ----------
+    old : list
+        The parsed nodes of the previous specification.
+    new : list
+        The parsed nodes of the current specification.
+
+    Returns
+    -------
+    tuple
+        The index of the first affected segment and of the segment after the
+        last affected segment, where 'None' refers to the end. 'None' if the
+        specifications are equal.
+
+    """
+
+    if old == new:
+        return None
+    num_nodes = min(len(old), len(new))
+    first = 0
+    while first < num_nodes and old[first] == new[first]:
+        first += 1
+    last = 0
+    while last < num_nodes - first and old[-1 - last] == new[-1 - last]:
+        last += 1
+    # the changes reach from the last unchanged node before them
+    # to the first unchanged node after them
+    start = 0 if first == 0 else int(old[first - 1][0])
+    stop = None if last == 0 else int(old[len(old) - last][0])
+    return start, stop
+
+
 class Automation:
     """Abstract base class for audio effect automation.
 
@@ -41,9 +77,10 @@ class Automation:
 
         """
 
-        def __init__(self, parent, index, transition, *args):
+        def __init__(self, parent, index, transition, *args, dtype=None):
             self._parent = parent
             self._index = index
+            self._dtype = dtype
             self._transition = getattr(self, transition)
             self._values = self.values(*args)
             if isarray(self._values) and len(self._values) == 1:
@@ -65,44 +102,116 @@ class Automation:
 
             return args
 
-        def process(self, target):
-            """Process parameters up to next node.
+        def process(self, target, start=0, stop=None):
+            """Process parameters up to next node. The range from start to
+            stop selects the units to process, relative to this node.
 
             """
 
-            return self._transition(target)
+            return self._transition(target, start, stop)
 
         # transition functions
 
-        def constant(self, target):
+        def constant(self, target, start=0, stop=None):
             """Constant interpolation."""
-            shape = self.num_chunks(target)
+            if stop is None:
+                stop = self.num_chunks(target)
+            shape = stop - start
             if isarray(self._values):
                 shape = (shape, 1)
-            return np.tile(self._values, shape)
+            return np.tile(np.asarray(self._values, dtype=self._dtype), shape)
 
-        def linear(self, target):
+        def linear(self, target, start=0, stop=None):
             """Linear interpolation."""
-            return np.linspace(self._values, target._values,
-                               self.num_chunks(target), False)
+            return linspace(self._values, target._values,
+                            self.num_chunks(target), self._dtype, start, stop)
 
-        def leftexp(self, target):
+        def leftexp(self, target, start=0, stop=None):
             """Left-bending exponential interpolation."""
             return expspace(self._values, target._values, 5,
-                            self.num_chunks(target))
+                            self.num_chunks(target), self._dtype, start, stop)
 
-        def rightexp(self, target):
+        def rightexp(self, target, start=0, stop=None):
             """Right-bending exponential interpolation."""
             return expspace(self._values, target._values, -5,
-                            self.num_chunks(target))
+                            self.num_chunks(target), self._dtype, start, stop)
+
+        def interpolate(self, target, positions):
+            """Evaluates the transition to the next node at arbitrary
+            positions.
+
+            Parameters
+            ----------
+            target : :class:`Node`
+                The next node.
+            positions : numpy array
+                The positions as fractions of the distance to the next node.
+
+            Returns
+            -------
+            numpy array
+                The values at the given positions.
+
+            """
+
+            name = self._transition.__name__
+            if name == 'leftexp' or name == 'rightexp':
+                exp = 5 if name == 'leftexp' else -5
+                return expinterp(self._values, target._values, exp,
+                                 positions, self._dtype)
+            values = np.asarray(self._values, dtype=self._dtype)
+            positions = np.asarray(positions, dtype=values.dtype)
+            if values.ndim > 0:
+                positions = positions[:, np.newaxis]
+            if name == 'linear':
+                deltas = np.subtract(target._values, values,
+                                     dtype=values.dtype)
+                return values + deltas * positions
+            return values + np.zeros_like(positions)
 
     def __init__(self, parent):
         self._parent = parent
 
     def __call__(self, params):
         """Process the whole audio effect mapping."""
+        envelope = self.envelope(params)
+        return self.process(envelope(envelope.start, envelope.stop))
+
+    def envelope(self, params):
+        """Compiles the audio effect mapping for random access.
+
+        Parameters
+        ----------
+        params : list
+            The parsed specification.
+
+        Returns
+        -------
+        :class:`Envelope`
+            The envelope of the mapping.
+
+        """
+
+        nodes = self.nodes(params)
+        positions = [self.node_position(node._index) for node in nodes]
+        return Envelope(nodes, positions, self.dtype)
+
+    def node_position(self, index):
+        """Position of a node with the given segment index in units of the
+        processed values.
+
+        """
+
+        return index
+
+    def nodes(self, params):
+        """Creates the nodes of the audio effect mapping. A copy of the last
+        node is appended if necessary, such that the nodes cover all segments.
+
+        """
+
         if len(params) == 0:
-            return self.process(np.empty(0))
+            return []
 
         nodes = []
         for param in params:
@@ -117,16 +226,12 @@ class Automation:
             if not isarray(argtypes):
                 argtypes = (argtypes, )
             param = [f(x) for f, x in zip(argtypes, param)]
-            nodes.append(self.Node(self._parent, index, transition, *param))
+            nodes.append(self.Node(self._parent, index, transition, *param,
+                                   dtype=self.dtype))
         if nodes[-1]._index < self.num_segments:
             nodes.append(copy.copy(nodes[-1]))
             nodes[-1]._index = self.num_segments
-
-        results = []
-        for i in range(len(nodes) - 1):
-            results.append(nodes[i].process(nodes[i + 1]))
-        results = np.concatenate(results)
-        return self.process(results)
+        return nodes
 
     def argtypes(self):
         """Determines the datatypes and number of the string input parameters.
@@ -145,6 +250,11 @@ class Automation:
         """Number of segments of the parent mix or track."""
         return self._parent.num_segments
 
+    @property
+    def dtype(self):
+        """Data type of the processed parameters."""
+        return np.dtype(np.float_)
+
     def process(self, values):
         """Interprete and process the nodes."""
         return values
@@ -159,3 +269,114 @@ class PerSampleAutomation(Automation):
     class Node(Automation.Node):
         def num_chunks(self, target):
             return self._parent.num_samples(self._index, target._index)
+
+    def node_position(self, index):
+        return self._parent.sample_indeces[index]
+
+    @property
+    def dtype(self):
+        return self._parent.audio.dtype
+
+
+class Envelope:
+    """Class evaluating automation nodes at arbitrary ranges. The values are
+    identical to the corresponding part of the whole processed mapping, while
+    only the requested range is computed. Nodes are found by binary search.
+
+    Parameters
+    ----------
+    nodes : list
+        The nodes of the mapping.
+    positions : list
+        The position of each node in units of the processed values.
+    dtype : numpy dtype
+        The data type of the processed values.
+
+    """
+
+    def __init__(self, nodes, positions, dtype):
+        self._nodes = nodes
+        self._positions = np.asarray(positions, dtype=int)
+        self._dtype = dtype
+
+    @property
+    def start(self):
+        """Position of the first node."""
+        if len(self._nodes) == 0:
+            return 0
+        return int(self._positions[0])
+
+    @property
+    def stop(self):
+        """Position of the last node."""
+        if len(self._nodes) == 0:
+            return 0
+        return int(self._positions[-1])
+
+    def __len__(self):
+        return self.stop - self.start
+
+    def __call__(self, start, stop):
+        """Evaluates the mapping in a range of positions.
+
+        Parameters
+        ----------
+        start : int
+            The first position.
+        stop : int
+            The position after the last position.
+
+        Returns
+        -------
+        numpy array
+            The values at the positions of the range, which has to lie
+            between the first and the last node.
+
+        """
+
+        results = []
+        index = max(np.searchsorted(self._positions, start, 'right') - 1, 0)
+        while index < len(self._nodes) - 1 and start < stop:
+            position = self._positions[index]
+            next_position = self._positions[index + 1]
+            if next_position > start:
+                end = min(stop, next_position)
+                results.append(self._nodes[index].process(
+                    self._nodes[index + 1], start - position, end - position))
+                start = end
+            index += 1
+        if len(results) > 0:
+            return np.concatenate(results)
+        if len(self._nodes) > 1:
+            return self._nodes[0].process(self._nodes[1], 0, 0)
+        return np.empty(0, dtype=self._dtype)
+
+    def at(self, positions):
+        """Evaluates the transitions between nodes at arbitrary positions.
+        Positions outside of the nodes take the value of the closest node.
+
+        Parameters
+        ----------
+        positions : numpy array
+            The positions.
+
+        Returns
+        -------
+        numpy array
+            The values at the given positions.
+
+        """
+
+        positions = np.asarray(positions)
+        values = np.zeros(positions.shape, dtype=self._dtype)
+        if len(self._nodes) < 2:
+            return values
+        indeces = np.searchsorted(self._positions, positions, 'right') - 1
+        indeces = np.clip(indeces, 0, len(self._nodes) - 2)
+        for index in np.unique(indeces):
+            mask = indeces == index
+            start, stop = self._positions[index:index + 2]
+            fractions = (positions[mask] - start) / max(stop - start, 1)
+            values[mask] = self._nodes[index].interpolate(
+                self._nodes[index + 1], np.clip(fractions, 0, 1))
+        return values
@@ -1,34 +1,63 @@
-import math
 import numpy as np
 from scipy import signal
+import threading
 
-from adapta.model.data import Audio
 from adapta.model.automation import Automation
 from adapta.util import db_to_ratio
 
 
 class Equalizer(Automation):
-    """Class for interpreting equalization specification.
+    """Class for interpreting equalization specification. The gains are
+    determined per segment and applied lazily to requested segments, with
+    the filter state carried over between consecutive requests.
+
+    Filter coefficients of all segments are computed at once when loading
+    the specification, and consecutive segments with equal gains are filtered
+    in one pass. Whenever the gains change noticeably, the coefficients are
+    ramped blockwise to avoid clicks. The ramp is carried over to the following
+    segments if a segment is shorter than the ramp.
 
     """
 
+    # number of samples used to settle the filters after a seek
+    warmup = 4096
+    # number of samples over which coefficients are ramped after a change
+    ramp_length = 1024
+    # number of samples filtered with constant coefficients while ramping
+    block_size = 128
+    # largest gain change in decibel that is applied without ramping
+    ramp_threshold = 0.5
+    # maximum number of cached coefficient sets
+    cache_size = 4096
+
+    # filter coefficients by sample rate, cutoff frequencies and gains,
+    # shared by the equalizers of all tracks
+    _cache = {}
+    _cache_lock = threading.Lock()
+
     def __init__(self, parent):
         super().__init__(parent)
         self.f_c = [1000, 8000]
         self.f_s = parent.audio.sample_rate
         self.reset_delays()
+        # index of the segment the filter state belongs to
+        self._position = 0
 
     @staticmethod
     def intermediate(f_s, f_c, G, Q=None):
-        """Intermediate shelf filter parameters."""
+        """Intermediate shelf filter parameters. Gains can be given as
+        arrays to compute the parameters of several filters at once.
+
+        """
+
         if Q is None:
-            Q = 1 / math.sqrt(2)
+            Q = 1 / np.sqrt(2)
 
-        A = math.sqrt(math.pow(10, G / 20))
-        omega_c = 2 * math.pi * f_c / f_s
-        S = math.sin(omega_c)
-        C = math.cos(omega_c)
-        beta = math.sqrt(A) / Q
+        A = np.sqrt(np.power(10, np.divide(G, 20)))
+        omega_c = 2 * np.pi * f_c / f_s
+        S = np.sin(omega_c)
+        C = np.cos(omega_c)
+        beta = np.sqrt(A) / Q
         return A, S, C, beta
 
     @staticmethod
@@ -45,7 +74,8 @@ class Equalizer(Automation):
         a_1 = -2 * (Am + Ap*C)
         a_2 = Ap + Am*C - gamma
 
-        return np.divide((b_0, b_1, b_2, a_0, a_1, a_2), a_0)
+        return np.divide(np.stack((b_0, b_1, b_2, a_0, a_1, a_2), -1),
+                         np.expand_dims(a_0, -1))
 
     @staticmethod
     def high_shelf(A, S, C, beta):
@@ -61,38 +91,191 @@ class Equalizer(Automation):
         a_1 = 2 * (Am - Ap*C)
         a_2 = Ap - Am*C - gamma
 
-        return np.divide((b_0, b_1, b_2, a_0, a_1, a_2), a_0)
+        return np.divide(np.stack((b_0, b_1, b_2, a_0, a_1, a_2), -1),
+                         np.expand_dims(a_0, -1))
+
+    def coefficients(self, gains):
+        """Computes the filters realizing 3-band equalizations. Coefficients
+        of previously used gains are taken from a cache.
+
+        Parameters
+        ----------
+        gains : numpy array
+            The bass, mid and treble gains in decibel of each equalization.
+
+        Returns
+        -------
+        numpy array
+            The second-order sections of the low and high shelf filters, with
+            the mid gain applied to the low shelf filter.
+
+        """
+
+        gains = np.asarray(gains, dtype=np.float64).reshape(-1, 3)
+        unique, inverse = np.unique(gains, axis=0, return_inverse=True)
+        keys = [(self.f_s, tuple(self.f_c), tuple(row))
+                for row in unique.tolist()]
+        # hold the coefficients locally, as other tracks may clear the cache
+        with self._cache_lock:
+            found = [self._cache.get(key) for key in keys]
+        missing = [i for i, sos in enumerate(found) if sos is None]
+        if len(missing) > 0:
+            bass, mid, treble = unique[missing].T
+            low = Equalizer.low_shelf(
+                *Equalizer.intermediate(self.f_s, self.f_c[0], bass - mid))
+            high = Equalizer.high_shelf(
+                *Equalizer.intermediate(self.f_s, self.f_c[1], treble - mid))
+            low[:, :3] *= db_to_ratio(mid)[:, np.newaxis]
+            for i, sos in zip(missing, np.stack((low, high), 1)):
+                found[i] = sos
+            with self._cache_lock:
+                if len(self._cache) + len(missing) > self.cache_size:
+                    self._cache.clear()
+                for i in missing:
+                    self._cache[keys[i]] = found[i]
+        table = np.stack(found)
+        return table[inverse.ravel()].astype(self.dtype)
 
     def reset_delays(self):
         """Reset all filter delays."""
         shape = [2, 2]
         if self._parent.audio.num_channels > 1:
             shape.append(self._parent.audio.num_channels)
-        self.zi = np.zeros(shape)
+        self.zi = np.zeros(shape, dtype=self.dtype)
+        # segment whose filter produced the current delays
+        self._current = None
+        # coefficients a ramp in progress starts from, the number of samples
+        # ramped so far and the coefficients used last
+        self._source = None
+        self._ramped = 0
+        self._used = None
 
     def apply_filter(self, array, gain_bass, gain_mid, gain_treble):
-        """Apply filters to achieve 3-band equalization."""
-        gain_bass -= gain_mid
-        gain_treble -= gain_mid
-        low = Equalizer.low_shelf(
-            *Equalizer.intermediate(self.f_s, self.f_c[0], gain_bass))
-        high = Equalizer.high_shelf(
-            *Equalizer.intermediate(self.f_s, self.f_c[1], gain_treble))
-        filter = np.row_stack((low, high))
-        array = array * db_to_ratio(gain_mid)
-        result, self.zi = signal.sosfilt(filter, array, 0, self.zi)
-        return result
+        """Apply filters to achieve 3-band equalization in place."""
+        sos = self.coefficients((gain_bass, gain_mid, gain_treble))[0]
+        array[:], self.zi = signal.sosfilt(sos, array, 0, self.zi)
+        self._current = None
+        self._source = None
+
+    @property
+    def dtype(self):
+        return self._parent.audio.dtype
+
+    @property
+    def position(self):
+        """Index of the segment the filter state is prepared for."""
+        return self._position
 
     def argtypes(self):
         return float, float, float
 
-    def process(self, values):
-        result = np.empty(self._parent.audio.shape, dtype=np.float_)
-        for i in range(len(values)):
-            start, stop = self._parent.sample_indeces[i:i+2]
-            gains = values[i]
-            result[start:stop] = self.apply_filter(
-                self._parent.audio[start:stop], *gains)
-        result = result.view(Audio)
-        result.sample_rate = self.f_s
-        return result
+    def load(self, params):
+        """Compiles the equalization specification and computes the filters
+        of all segments.
+
+        Parameters
+        ----------
+        params : list
+            The parsed equalization specification.
+
+        """
+
+        self._gains = self.envelope(params)
+        gains = self._gains(self._gains.start, self._gains.stop)
+        self._sos = self.coefficients(gains)
+        # segments with equal gains share a filter identifier
+        self._unique, self._filters = np.unique(
+            gains.reshape(-1, 3), axis=0, return_inverse=True)
+        self._filters = self._filters.ravel()
+
+    def _filter(self, array, index):
+        """Equalizes samples in place with the filter of a segment, given
+        relative to the first node. Coefficients are ramped from the
+        previously used ones unless the gains change only slightly, as in
+        gradual transitions. The ramp is split into blocks by its progress,
+        such that the result does not depend on how the samples are split
+        into calls. A ramp in progress continues towards the new filter.
+
+        """
+
+        sos = self._sos[index]
+        previous = self._current
+        if (previous is not None
+                and self._filters[previous] != self._filters[index]):
+            change = np.abs(self._unique[self._filters[index]]
+                            - self._unique[self._filters[previous]]).max()
+            if change > self.ramp_threshold:
+                # start from the coefficients of an unfinished ramp as well
+                self._source = self._used
+                self._ramped = 0
+        start = 0
+        while self._source is not None and start < array.shape[0]:
+            # interpolate the coefficients blockwise
+            end = min((self._ramped // self.block_size + 1) * self.block_size,
+                      self.ramp_length)
+            stop = min(start + end - self._ramped, array.shape[0])
+            weight = end / self.ramp_length
+            self._used = (self._source * (1 - weight)
+                          + sos * weight).astype(self.dtype)
+            array[start:stop], self.zi = signal.sosfilt(
+                self._used, array[start:stop], 0, self.zi)
+            self._ramped += stop - start
+            start = stop
+            if self._ramped >= self.ramp_length:
+                self._source = None
+        if start < array.shape[0]:
+            array[start:], self.zi = signal.sosfilt(sos, array[start:], 0,
+                                                    self.zi)
+            self._used = sos
+        self._current = index
+
+    def apply(self, audio, start, stop):
+        """Equalizes the samples of a segment range in place.
+
+        Parameters
+        ----------
+        audio : :class:`Audio`
+            The samples of the segment range.
+        start : int
+            The index of the first segment.
+        stop : int
+            The index of the segment after the last segment.
+
+        """
+
+        indeces = self._parent.sample_indeces
+        offset = indeces[start]
+        first = self._gains.start
+        start = max(start, first)
+        end = min(stop, self._gains.stop)
+        while start < end:
+            # equalize segments with equal gains at once
+            following = start + 1
+            filter = self._filters[start - first]
+            while (following < end
+                   and self._filters[following - first] == filter):
+                following += 1
+            self._filter(audio[indeces[start] - offset:
+                               indeces[following] - offset], start - first)
+            start = following
+        self._position = stop
+
+    def seek(self, audio, index):
+        """Prepares the filter state for a segment that does not follow the
+        previously equalized one.
+
+        Parameters
+        ----------
+        audio : :class:`Audio`
+            The samples directly preceding the segment, which are used to
+            settle the filters. Their equalized values are discarded.
+        index : int
+            The index of the segment.
+
+        """
+
+        self.reset_delays()
+        previous = index - 1 - self._gains.start
+        if 0 <= previous < len(self._filters) and audio.shape[0] > 0:
+            self._filter(audio, previous)
+        self._position = index
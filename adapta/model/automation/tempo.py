@@ -1,11 +1,13 @@
 import numpy as np
 
-from adapta.model.automation import Automation
+from adapta.model.automation import Automation, Envelope
 from adapta.util import bpm_to_time
 
 
 class Tempo(Automation):
-    """Class for interpreting tempo specification.
+    """Class for interpreting tempo specification. The beat positions are
+    kept between updates, such that only the positions following changed
+    nodes are computed again.
 
     """
 
@@ -17,9 +19,16 @@ class Tempo(Automation):
                 return self._values
             return self._master.bpm
 
+        @property
+        def key(self):
+            """Properties determining the values of the node."""
+            return (self._index, self._transition.__name__, self._values,
+                    self._master)
+
         def values(self, master, tempo):
-            if master in self._parent.tracks:
-                self._master = self._parent.tracks[master]
+            track = self._parent._tracks.get(master)
+            if track is not None and track.initialized:
+                self._master = track
                 if tempo[-1] == '%':
                     factor = 1 + float(tempo[:-1]) / 100
                     return self.source_bpm * factor
@@ -32,18 +41,27 @@ class Tempo(Automation):
                 self._master = None
                 return float(tempo)
 
-        def process(self, target):
-            ratios = self._transition(target) / self.source_bpm
+        def process(self, target, start=0, stop=None):
+            if stop is None:
+                stop = self.num_chunks(target)
+            ratios = self._transition(target, start, stop) / self.source_bpm
 
             if self._master is None:
                 time = bpm_to_time(self._values)
-                return np.tile(time, self.num_chunks(target)) / ratios
+                return np.tile(time, stop - start) / ratios
 
-            start = self._master.to_local(self._index)
-            stop = self._master.to_local(target._index + 1)
-            lengths = np.diff(self._master.times[start:stop])
+            offset = self._master.to_local(self._index)
+            lengths = np.diff(
+                self._master.times[offset + start:offset + stop + 1])
             return lengths / ratios
 
+    def __init__(self, parent):
+        super().__init__(parent)
+        # properties of the nodes the beat positions were computed with
+        self._keys = []
+        self._times = np.zeros(1)
+        self._times.setflags(write=False)
+
     @property
     def num_segments(self):
         return max(track.position + track.num_segments
@@ -58,3 +76,56 @@ class Tempo(Automation):
         times[0] = 0.0
         times[1:] = np.cumsum(values)
         return times
+
+    def update(self, params):
+        """Computes the beat positions according to a changed specification.
+        The positions up to the node preceding the first changed node are
+        kept, the following positions are identical to those computed from
+        scratch.
+
+        Parameters
+        ----------
+        params : list
+            The parsed tempo specification.
+
+        Returns
+        -------
+        numpy array
+            The beat positions in seconds.
+        int
+            The index of the first segment whose end position has changed.
+
+        """
+
+        nodes = self.nodes(params)
+        keys = [node.key for node in nodes]
+        first = 0
+        while (first < min(len(keys), len(self._keys))
+               and keys[first] == self._keys[first]):
+            first += 1
+        previous = self._keys
+        if first == len(keys) == len(previous):
+            return self._times, self._times.size - 1
+
+        # the transition to the first changed node is computed again,
+        # constant transitions only where the nodes differ in position
+        envelope = Envelope(nodes, [node._index for node in nodes],
+                            self.dtype)
+        start = 0
+        if first > 0:
+            start = nodes[first - 1]._index
+            if (keys[first - 1][1] == 'constant'
+                    and first < len(keys) and first < len(previous)):
+                start = min(keys[first][0], previous[first][0])
+            start -= envelope.start
+        values = envelope(envelope.start + start, envelope.stop)
+        times = np.empty(len(envelope) + 1)
+        times[:start + 1] = self._times[:start + 1]
+        # accumulate in the same order as for the whole specification
+        np.cumsum(np.concatenate((times[start:start + 1], values)),
+                  out=times[start:])
+        times.setflags(write=False)
+        # only keep the specification once the positions are computed
+        self._keys = keys
+        self._times = times
+        return times, start
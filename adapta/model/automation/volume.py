@@ -5,16 +5,114 @@ from adapta.util import db_to_ratio
 
 
 class Volume(PerSampleAutomation):
-    """Class for interpreting volume specification.
+    """Class for interpreting volume specification. The gain is computed at
+    control rate and at the nodes, and linearly interpolated in between. It is
+    applied lazily to the requested samples only.
 
     """
 
+    # number of samples between control points
+    control_period = 64
+
     def argtypes(self):
         return float
 
-    def process(self, values):
-        factors = db_to_ratio(values)
-        num_channels = self._parent.audio.num_channels
-        if num_channels > 1:
-            factors = np.tile(factors, (num_channels, 1)).T
-        return self._parent.audio * factors
+    def load(self, params):
+        """Compiles the volume specification.
+
+        Parameters
+        ----------
+        params : list
+            The parsed volume specification.
+
+        """
+
+        self._envelope = self.envelope(params)
+        self._num_samples = self._parent.num_samples(0, self.num_segments)
+        # add control points around the nodes to keep sudden changes sharp
+        positions = self._envelope._positions
+        positions = np.concatenate((positions, positions - 1))
+        self._node_positions = np.unique(
+            np.clip(positions, 0, self._num_samples))
+
+    def control_points(self, start, stop):
+        """Positions of the control points enclosing a range of samples.
+
+        Parameters
+        ----------
+        start : int
+            The index of the first sample.
+        stop : int
+            The index of the sample after the last sample.
+
+        Returns
+        -------
+        numpy array
+            The sorted positions of the control points.
+
+        """
+
+        first = start // self.control_period * self.control_period
+        last = -(-(stop - 1) // self.control_period) * self.control_period
+        last = min(last, self._num_samples)
+        positions = np.arange(first, last, self.control_period)
+        lower, upper = np.searchsorted(self._node_positions, (first, last),
+                                       'right')
+        positions = np.concatenate(
+            (positions, self._node_positions[lower:upper], [last]))
+        return np.unique(positions)
+
+    def apply(self, audio, start):
+        """Applies the gain to the given samples in place.
+
+        Parameters
+        ----------
+        audio : :class:`Audio`
+            Consecutive samples of the parent.
+        start : int
+            The sample index of the first given sample.
+
+        """
+
+        if audio.shape[0] == 0:
+            return
+        stop = start + audio.shape[0]
+        points = self.control_points(start, stop)
+        gains = db_to_ratio(self._envelope.at(points), self.dtype)
+        factors = self._interpolate(points, gains)
+        factors = factors[start - points[0]:stop - points[0]]
+        if audio.ndim > 1:
+            factors = factors[:, np.newaxis]
+        audio *= factors
+
+    def _interpolate(self, points, gains):
+        """Linearly interpolates gains from the first to the last control
+        point, including the last one. The values are computed in the data
+        type of the gains, per run of regularly spaced control points.
+
+        """
+
+        period = self.control_period
+        ramp = np.arange(period, dtype=gains.dtype) / gains.dtype.type(period)
+        lengths = np.diff(points)
+        deltas = np.diff(gains)
+        offsets = points - points[0]
+        factors = np.empty(offsets[-1] + 1, dtype=gains.dtype)
+        factors[-1] = gains[-1]
+        # control points around the nodes break the regular spacing
+        irregular = np.flatnonzero(lengths != period)
+        first = 0
+        for last in np.append(irregular, len(lengths)):
+            if first < last:
+                block = factors[offsets[first]:offsets[last]]
+                block.shape = (-1, period)
+                np.multiply(deltas[first:last, np.newaxis], ramp, out=block)
+                block += gains[first:last, np.newaxis]
+            if last < len(lengths):
+                length = lengths[last]
+                fractions = np.arange(length, dtype=gains.dtype)
+                fractions /= gains.dtype.type(length)
+                factors[offsets[last]:offsets[last + 1]] = \
+                    gains[last] + deltas[last] * fractions
+            first = last + 1
+        return factors
@@ -1,2 +1,6 @@
+from adapta.model.beatdetection.activationcache import ActivationCache
+from adapta.model.beatdetection.beatcache import BeatCache
 from adapta.model.beatdetection.beatprocessor import BeatProcessor
+from adapta.model.beatdetection.gridestimator import GridEstimator
 from adapta.model.beatdetection.notifier import Notifier
+from adapta.model.beatdetection.scheduler import Scheduler
@@ -0,0 +1,57 @@
+import madmom
+
+from adapta.util import hash_file, use_settings, Cache
+
+
+@use_settings
+class ActivationCache(Cache):
+    """Persistent cache of the downbeat activations computed by the neural
+    network stage of the beat detection. Entries are identified by the content
+    of the audio file, the analysed region and the madmom version, so they
+    stay valid when the beat tracking settings change.
+
+    """
+
+    def entry(self, path, start=None, stop=None):
+        """Key of the entry storing the activations of an audio file."""
+        return self.key(hash_file(path), start, stop, madmom.__version__)
+
+    def load(self, path, start=None, stop=None):
+        """Fetches the cached activations of an audio file.
+
+        Parameters
+        ----------
+        path : str
+            The path to the audio file.
+        start : float, optional
+            The start of the analysed region in seconds.
+        stop : float, optional
+            The stop of the analysed region in seconds.
+
+        Returns
+        -------
+        numpy array
+            The beat and downbeat activations per frame, or 'None' if they are
+            not cached.
+
+        """
+
+        return self.get(self.entry(path, start, stop))
+
+    def store(self, path, activations, start=None, stop=None):
+        """Stores the activations of an audio file.
+
+        Parameters
+        ----------
+        path : str
+            The path to the audio file.
+        activations : numpy array
+            The beat and downbeat activations per frame.
+        start : float, optional
+            The start of the analysed region in seconds.
+        stop : float, optional
+            The stop of the analysed region in seconds.
+
+        """
+
+        self.put(self.entry(path, start, stop), activations)
@@ -0,0 +1,65 @@
+import madmom
+
+from adapta.util import hash_file, use_settings, Cache
+
+
+@use_settings
+class BeatCache(Cache):
+    """Persistent cache of detected beat positions. Entries are identified by
+    the content of the audio file, the analysed region, the beat tracking
+    settings and the madmom version.
+
+    """
+
+    """ Settings """
+    # assumed number of beats per bar
+    beats_per_bar = int
+    # constant tempo likelihood
+    transition_lambda = int
+    # minimum tempo in bpm
+    min_bpm = float
+
+    def entry(self, path, start=None, stop=None):
+        """Key of the entry storing the beats of an audio file."""
+        return self.key(hash_file(path), start, stop, self.beats_per_bar,
+                        self.transition_lambda, self.min_bpm,
+                        madmom.__version__)
+
+    def load(self, path, start=None, stop=None):
+        """Fetches the cached beat positions of an audio file.
+
+        Parameters
+        ----------
+        path : str
+            The path to the audio file.
+        start : float, optional
+            The start of the analysed region in seconds.
+        stop : float, optional
+            The stop of the analysed region in seconds.
+
+        Returns
+        -------
+        numpy array
+            The beat positions in seconds, or 'None' if they are not cached.
+
+        """
+
+        return self.get(self.entry(path, start, stop))
+
+    def store(self, path, beats, start=None, stop=None):
+        """Stores the beat positions of an audio file.
+
+        Parameters
+        ----------
+        path : str
+            The path to the audio file.
+        beats : numpy array
+            The beat positions in seconds.
+        start : float, optional
+            The start of the analysed region in seconds.
+        stop : float, optional
+            The stop of the analysed region in seconds.
+
+        """
+
+        self.put(self.entry(path, start, stop), beats)
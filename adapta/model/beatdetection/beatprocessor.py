@@ -1,12 +1,22 @@
 from madmom.features import DBNDownBeatTrackingProcessor, RNNDownBeatProcessor
 from madmom.processors import SequentialProcessor
+import numpy as np
+import subprocess
 
+from adapta.model.beatdetection import ActivationCache, BeatCache
 from adapta.util import use_settings
 
 
 @use_settings
 class BeatProcessor(SequentialProcessor):
-    """Class estimating beat positions of given audio files.
+    """Class estimating beat positions of given audio files. The activations
+    of the neural network stage are cached, so that changing the beat tracking
+    settings only repeats the decoding stage.
+
+    Long regions can be split into overlapping chunks whose activations are
+    computed independently, e.g. by several worker processes. The activations
+    of the chunks are cross-faded in the overlaps before a single decoding
+    pass, so memory usage is bounded by the chunk length.
 
     """
 
@@ -15,23 +25,212 @@ class BeatProcessor(SequentialProcessor):
     beats_per_bar = int
     # constant tempo likelihood
     transition_lambda = 400
+    # minimum tempo in bpm
+    min_bpm = float
+    # time analysed before and after the used part of a track in seconds
+    margin = float
+    # length of the chunks long regions are split into in seconds, or null
+    chunk_length = float
+    # overlap of neighbouring chunks in seconds
+    chunk_overlap = float
+
+    # frame rate of the activations
+    fps = 100
 
-    def __init__(self, todo, results):
-        preprocessor = RNNDownBeatProcessor()
+    def __init__(self):
+        self._preprocessor = RNNDownBeatProcessor()
+        self._cache = ActivationCache()
         processor = DBNDownBeatTrackingProcessor(
             self.beats_per_bar,
-            fps=100,
+            min_bpm=self.min_bpm,
+            fps=self.fps,
             transition_lambda=self.transition_lambda)
-        sequence = (preprocessor, processor, lambda x: x[:, 0])
+        sequence = (processor, _beat_times)
         super().__init__(sequence)
 
-        self._todo = todo
-        self._results = results
+    def activations(self, audio, start=None, stop=None):
+        """Computes the beat and downbeat activations of a region of an audio
+        file, or fetches them from the cache.
+
+        """
+
+        activations = self._cache.load(audio, start, stop)
+        if activations is None:
+            activations = self._preprocessor(audio, start=start, stop=stop)
+            activations = activations.astype(np.float32)
+            self._cache.store(audio, activations, start, stop)
+        return activations
+
+    @staticmethod
+    def duration(path):
+        """Determines the duration of an audio file in seconds, or returns
+        'None' if it cannot be determined.
+
+        """
+
+        try:
+            output = subprocess.check_output(
+                ['ffprobe', '-v', 'quiet', '-show_entries', 'format=duration',
+                 '-of', 'csv=p=0', path])
+            return float(output)
+        except (OSError, subprocess.CalledProcessError, ValueError):
+            return None
+
+    def split(self, job):
+        """Splits the region of a job into overlapping chunks.
+
+        Parameters
+        ----------
+        job : tuple
+            The path to the audio file, and start and stop of the region in
+            seconds. 'None' refers to the boundaries of the file.
+
+        Returns
+        -------
+        list
+            Tuples of start and stop of each chunk in seconds, or 'None' if
+            the region is not longer than a single chunk.
+
+        """
+
+        if self.chunk_length is None:
+            return None
+        audio, start, stop = job
+        end = stop
+        if end is None:
+            end = self.duration(audio)
+            if end is None:
+                return None
+        offset = 0.0 if start is None else start
+        if end - offset <= self.chunk_length:
+            return None
+        # align the chunks to the frame grid of the region
+        hop = self._hop / self.fps
+        regions = []
+        index = 0
+        while offset + index * hop + self.chunk_length < end:
+            position = round(offset + index * hop, 6)
+            regions.append((position, round(position + self.chunk_length, 6)))
+            index += 1
+        regions.append((round(offset + index * hop, 6), stop))
+        if start is None:
+            regions[0] = (None, regions[0][1])
+        return regions
+
+    def stitch(self, chunks):
+        """Combines the activations of the chunks of a region by cross-fading
+        them in the overlaps.
+
+        Parameters
+        ----------
+        chunks : list
+            The activations of each chunk, as returned by :meth:`split`.
+
+        Returns
+        -------
+        numpy array
+            The activations of the whole region.
+
+        """
+
+        hop = self._hop
+        num_frames = max(index * hop + len(chunk)
+                         for index, chunk in enumerate(chunks))
+        shape = (num_frames,) + chunks[0].shape[1:]
+        result = np.zeros(shape, np.float32)
+        weights = np.zeros(num_frames, np.float32)
+        for index, chunk in enumerate(chunks):
+            weight = np.ones(len(chunk), np.float32)
+            if index > 0:
+                size = min(max(len(chunks[index - 1]) - hop, 0), len(chunk))
+                weight[:size] = np.arange(1, size + 1) / (size + 1)
+            if index < len(chunks) - 1:
+                size = min(max(len(chunk) - hop, 0), len(chunk))
+                weight[len(chunk) - size:] *= \
+                    np.arange(size, 0, -1) / (size + 1)
+            offset = index * hop
+            result[offset:offset + len(chunk)] += chunk * weight[:, np.newaxis]
+            weights[offset:offset + len(chunk)] += weight
+        np.divide(result, weights[:, np.newaxis], out=result,
+                  where=weights[:, np.newaxis] > 0)
+        return result
+
+    @property
+    def _hop(self):
+        """Number of frames between the starts of neighbouring chunks."""
+        return int(round((self.chunk_length - self.chunk_overlap) * self.fps))
 
-    def run(self):
-        """Start continuously estimating beat positions."""
+    def process(self, job, **kwargs):
+        """Estimates the beat positions of a region of an audio file.
+
+        Parameters
+        ----------
+        job : tuple
+            The path to the audio file, and start and stop of the region in
+            seconds. 'None' refers to the boundaries of the file.
+
+        Returns
+        -------
+        numpy array
+            The beat positions in seconds relative to the start of the file.
+
+        """
+
+        audio, start, stop = job
+        activations = self.activations(audio, start, stop)
+        return self.decode(job, activations, **kwargs)
+
+    def decode(self, job, activations, **kwargs):
+        """Estimates the beat positions of a region of an audio file from the
+        given activations.
+
+        """
+
+        beats = super().process(activations, **kwargs)
+        start = job[1]
+        if start is not None:
+            beats = beats + start
+        return beats
+
+    def run(self, connection):
+        """Start continuously processing the tasks received through the given
+        connection. Tasks are tuples of a task name and its arguments:
+
+        * 'activations': computes the activations of a region,
+        * 'beats': estimates the beat positions of a job,
+        * 'decode': estimates the beat positions of a job from activations.
+
+        If a task fails, the error message is sent under the name 'failed'.
+
+        """
+
+        cache = BeatCache()
         while True:
-            tasks = self._todo.get()
-            for name, audio in tasks:
-                beats = self.process(audio)
-                self._results.put((name, beats))
+            task, args = connection.recv()
+            try:
+                if task == 'activations':
+                    connection.send((task, self.activations(*args)))
+                    continue
+                if task == 'decode':
+                    job, activations = args
+                    beats = self.decode(job, activations)
+                else:
+                    job = args
+                    beats = self.process(job)
+                audio, start, stop = job
+                cache.store(audio, beats, start, stop)
+            except Exception as error:
+                # report the error and keep the worker alive
+                connection.send(('failed', '{}: {}'.format(
+                    type(error).__name__, error)))
+                continue
+            connection.send((task, beats))
+
+
+def _beat_times(beats):
+    """Drops the positions within the bar of the tracked beats. Defined on
+    module level, so that the processor can be sent to spawned workers.
+
+    """
+
+    return beats[:, 0]
@@ -0,0 +1,181 @@
+import numpy as np
+
+from adapta.util import round_, use_settings
+
+
+@use_settings
+class GridEstimator:
+    """Class quickly estimating a provisional beat grid of constant tempo.
+    Onsets are detected by spectral flux, the tempo by autocorrelation of the
+    onset strength and the phase by aligning the grid to the onsets. The
+    estimate is meant to be replaced by the result of :class:`BeatProcessor`.
+
+    """
+
+    """ Settings """
+    # estimate provisional beats before the full beat detection finishes
+    enabled = bool
+    # minimum tempo in bpm
+    min_bpm = float
+    # maximum tempo in bpm
+    max_bpm = float
+    # most likely tempo in bpm
+    prior_bpm = float
+
+    # frame rate of the onset strength
+    fps = 100
+    # frame size in samples
+    frame_size = 2048
+    # number of frames transformed at once
+    block_size = 1024
+    # number of beats spanned by the longest lag refining the tempo
+    refinement_span = 32
+
+    def onsets(self, audio):
+        """Computes the onset strength of an audio signal.
+
+        Parameters
+        ----------
+        audio : :class:`Audio`
+            The audio signal.
+
+        Returns
+        -------
+        numpy array
+            The positive spectral flux per frame, where frame k is centered at
+            k / fps seconds.
+
+        """
+
+        # mix down and pad so that frames are centered at their positions
+        mono = np.zeros(audio.shape[0] + self.frame_size, np.float32)
+        center = self.frame_size // 2
+        if audio.ndim > 1:
+            np.mean(audio, axis=1, out=mono[center:center + audio.shape[0]])
+        else:
+            mono[center:center + audio.shape[0]] = audio
+        hop = audio.sample_rate / self.fps
+        num_frames = int(audio.shape[0] / hop) + 1
+        starts = round_(np.arange(num_frames) * hop)
+        window = np.hanning(self.frame_size).astype(np.float32)
+        offsets = np.arange(self.frame_size)
+
+        result = np.zeros(num_frames, np.float32)
+        previous = None
+        for start in range(0, num_frames, self.block_size):
+            indices = starts[start:start + self.block_size, np.newaxis]
+            frames = mono[indices + offsets] * window
+            spectrum = np.abs(np.fft.rfft(frames)).astype(np.float32)
+            np.log1p(spectrum, out=spectrum)
+            if previous is None:
+                previous = spectrum[:1]
+            flux = np.diff(np.concatenate((previous, spectrum)), axis=0)
+            np.maximum(flux, 0, out=flux)
+            result[start:start + len(spectrum)] = flux.sum(axis=1)
+            previous = spectrum[-1:]
+        return result
+
+    def tempo(self, onsets):
+        """Estimates the beat period of an onset strength function.
+
+        Parameters
+        ----------
+        onsets : numpy array
+            The onset strength per frame.
+
+        Returns
+        -------
+        float
+            The beat period in frames.
+
+        """
+
+        min_lag = max(int(60 * self.fps / self.max_bpm), 1)
+        max_lag = int(np.ceil(60 * self.fps / self.min_bpm))
+        # autocorrelation of the onset strength
+        signal = onsets - onsets.mean()
+        size = 1 << int(np.ceil(np.log2(2 * signal.size + 1)))
+        spectrum = np.fft.rfft(signal, size)
+        correlation = np.fft.irfft(spectrum * spectrum.conj(), size)
+        correlation = correlation[:signal.size]
+        if correlation.size < 2 * max_lag + 2:
+            correlation = np.pad(
+                correlation, (0, 2 * max_lag + 2 - correlation.size))
+
+        # weight lags by a log-normal tempo prior of one octave deviation
+        # and reward lags whose double also correlates
+        lags = np.arange(min_lag, max_lag + 1)
+        bpm = 60 * self.fps / lags
+        prior = np.exp(-0.5 * np.log2(bpm / self.prior_bpm) ** 2)
+        scores = (correlation[lags] + 0.5 * correlation[2 * lags]) * prior
+        period = float(lags[np.argmax(scores)])
+
+        # refine the period with the correlation peaks of multiple beats
+        num_beats = 1
+        while num_beats < self.refinement_span:
+            num_beats *= 2
+            lag = int(round(num_beats * period))
+            if lag + 2 >= correlation.size:
+                break
+            lag += np.argmax(correlation[lag - 1:lag + 2]) - 1
+            left, middle, right = correlation[lag - 1:lag + 2]
+            denominator = left - 2 * middle + right
+            offset = 0.0
+            if denominator < 0:
+                offset = 0.5 * (left - right) / denominator
+            period = (lag + offset) / num_beats
+        return period
+
+    def phase(self, onsets, period):
+        """Finds the offset of a beat grid that best matches the onsets.
+
+        Parameters
+        ----------
+        onsets : numpy array
+            The onset strength per frame.
+        period : float
+            The beat period in frames.
+
+        Returns
+        -------
+        int
+            The frame of the first beat.
+
+        """
+
+        phases = np.arange(int(np.ceil(period)))
+        num_beats = max(int((onsets.size - phases[-1] - 1) / period) + 1, 1)
+        positions = phases[:, np.newaxis] + np.arange(num_beats) * period
+        positions = np.minimum(round_(positions), onsets.size - 1)
+        return int(phases[np.argmax(onsets[positions].sum(axis=1))])
+
+    def process(self, audio, start=None, stop=None):
+        """Estimates a beat grid of a region of an audio signal.
+
+        Parameters
+        ----------
+        audio : :class:`Audio`
+            The audio signal.
+        start : float, optional
+            The start of the region in seconds.
+        stop : float, optional
+            The stop of the region in seconds.
+
+        Returns
+        -------
+        numpy array
+            The beat positions in seconds relative to the start of the signal.
+
+        """
+
+        offset = 0.0 if start is None else start
+        start_index = audio.time_to_index(offset)
+        stop_index = None if stop is None else audio.time_to_index(stop)
+        region = audio[start_index:stop_index]
+        onsets = self.onsets(region)
+        if onsets.size < 2:
+            return np.empty(0)
+        period = self.tempo(onsets)
+        phase = self.phase(onsets, period)
+        beats = np.arange(phase, onsets.size, period)
+        return beats / self.fps + offset
@@ -10,7 +10,7 @@ class Notifier(Threadable):
     """
 
     """ Signals """
-    sig_send = QtCore.Signal(str, object)
+    sig_send = QtCore.Signal(object, object)
 
     def __init__(self, results):
         super().__init__()
@@ -19,5 +19,5 @@ class Notifier(Threadable):
     def run(self):
         """Start continuously waiting for newly detected beats."""
         while True:
-            name, beats = self._results.get()
-            self.sig_send.emit(name, beats)
+            job, beats = self._results.get()
+            self.sig_send.emit(job, beats)
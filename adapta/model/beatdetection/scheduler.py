@@ -0,0 +1,250 @@
+import heapq
+import itertools
+import multiprocessing
+from multiprocessing.connection import wait
+import os
+import threading
+from warnings import warn
+
+from adapta.util import dump, load, use_settings
+
+
+@use_settings
+class Scheduler:
+    """Class distributing beat detection jobs to a pool of worker processes.
+    Jobs are handed out one at a time in order of their priority, so idle
+    workers always pick the most urgent one. Jobs the processor splits into
+    chunks are distributed chunk by chunk, and decoded once all chunks are
+    done.
+
+    Workers are spawned instead of forked, as the scheduler runs alongside
+    the threads of the application. Jobs whose processing fails, including
+    jobs of workers that die, are reported without beats.
+
+    Parameters
+    ----------
+    processor : :class:`BeatProcessor`
+        The processor run by each worker process.
+
+    """
+
+    """ Settings """
+    # number of worker processes, or null to use one per CPU
+    num_workers = int
+
+    def __init__(self, processor):
+        self._processor = processor
+        self._lock = threading.RLock()
+        self._counter = itertools.count()
+        self._queue = []
+        self._priorities = {}
+        self._regions = {}
+        self._chunks = {}
+        self._retired = []
+        self._context = multiprocessing.get_context('spawn')
+        self._wakeup, self._notify = self._context.Pipe(False)
+        num_workers = self.num_workers or os.cpu_count() or 1
+        self._workers = [self._start() for _ in range(num_workers)]
+        self._tasks = [None] * num_workers
+
+    def _start(self):
+        """Start a new worker process."""
+        connection, child = self._context.Pipe()
+        process = self._context.Process(
+            target=_start_worker, args=(self._processor, dump(), child),
+            daemon=True)
+        process.start()
+        child.close()
+        return process, connection
+
+    def _restart(self, index):
+        """Cancel the task of a worker by replacing the worker process."""
+        process, connection = self._workers[index]
+        process.terminate()
+        # the connection is closed by the receiving thread
+        self._retired.append(connection)
+        self._workers[index] = self._start()
+        self._tasks[index] = None
+        self._notify.send(None)
+
+    def _fail(self, job, message):
+        """Drop the remaining tasks of a job whose processing failed."""
+        warn('could not detect beats of {}: {}'.format(job[0], message))
+        self._queue = [entry for entry in self._queue if entry[2][1] != job]
+        heapq.heapify(self._queue)
+        self._chunks.pop(job, None)
+        self._priorities.pop(job, None)
+
+    def _died(self, connection):
+        """Handle a worker process that died unexpectedly. A worker that was
+        processing a task is replaced, an idle worker is dropped as it failed
+        on its own. Returns the job of the task, or 'None' if it was idle.
+
+        """
+
+        for index, (process, current) in enumerate(self._workers):
+            if current is connection:
+                break
+        else:
+            return None
+        process.join()
+        connection.close()
+        task = self._tasks[index]
+        message = 'worker exited with code {}'.format(process.exitcode)
+        if task is None:
+            warn('beat detection {}'.format(message))
+            del self._workers[index]
+            del self._tasks[index]
+            return None
+        self._workers[index] = self._start()
+        self._tasks[index] = None
+        self._fail(task[1], message)
+        self._dispatch()
+        return task[1]
+
+    def _push(self, job, task, index=None):
+        """Add a task of a job to the queue."""
+        priority = self._priorities[job]
+        entry = (priority, next(self._counter), (task, job, index))
+        heapq.heappush(self._queue, entry)
+
+    def _expand(self, job):
+        """Add all remaining tasks of a job to the queue."""
+        regions = self._regions[job]
+        if regions is None:
+            tasks = [('beats', job, None)]
+        else:
+            chunks = self._chunks.setdefault(job, [None] * len(regions))
+            if all(chunk is not None for chunk in chunks):
+                tasks = [('decode', job, None)]
+            else:
+                tasks = [('activations', job, index)
+                         for index, chunk in enumerate(chunks)
+                         if chunk is None]
+        for name, _, index in tasks:
+            if (name, job, index) not in self._tasks:
+                self._push(job, name, index)
+
+    def _message(self, task):
+        """Message instructing a worker to perform a task."""
+        name, job, index = task
+        if name == 'activations':
+            start, stop = self._regions[job][index]
+            return name, (job[0], start, stop)
+        if name == 'decode':
+            return name, (job, self._processor.stitch(self._chunks[job]))
+        return name, job
+
+    def _dispatch(self):
+        """Hand out pending tasks to idle workers."""
+        for index, (_, connection) in enumerate(self._workers):
+            if len(self._queue) == 0:
+                break
+            if self._tasks[index] is None:
+                _, _, task = heapq.heappop(self._queue)
+                self._tasks[index] = task
+                connection.send(self._message(task))
+
+    def schedule(self, tasks):
+        """Replaces all pending jobs. Running jobs that are not requested
+        anymore are cancelled. Jobs spanning long regions are split into
+        chunks that are processed in parallel.
+
+        Parameters
+        ----------
+        tasks : list
+            Tuples of priority and job, where each job is passed to the
+            processor as is. Lower values mean higher priority.
+
+        """
+
+        # splitting may probe the audio files, which must not hold up the
+        # results of the workers
+        with self._lock:
+            regions = {job: self._regions[job] for _, job in tasks
+                       if job in self._regions}
+        for _, job in tasks:
+            if job not in regions:
+                regions[job] = self._processor.split(job)
+
+        with self._lock:
+            self._priorities = {}
+            for priority, job in tasks:
+                self._priorities[job] = min(
+                    priority, self._priorities.get(job, priority))
+            for index, task in enumerate(self._tasks):
+                if task is not None and task[1] not in self._priorities:
+                    self._restart(index)
+            for job in list(self._chunks):
+                if job not in self._priorities:
+                    del self._chunks[job]
+            self._regions = regions
+            self._queue = []
+            for job in self._priorities:
+                self._expand(job)
+            self._dispatch()
+
+    def get(self):
+        """Waits for the next result of any worker.
+
+        Returns
+        -------
+        tuple
+            The processed job and the beat positions, or 'None' if the job
+            failed.
+
+        """
+
+        while True:
+            with self._lock:
+                connections = [connection for _, connection in self._workers]
+                connections += self._retired
+            connections.append(self._wakeup)
+            for connection in wait(connections):
+                if connection is self._wakeup:
+                    connection.recv()
+                    break
+                try:
+                    name, result = connection.recv()
+                except (EOFError, OSError):
+                    with self._lock:
+                        if connection in self._retired:
+                            # the worker has been replaced
+                            self._retired.remove(connection)
+                            connection.close()
+                            continue
+                        job = self._died(connection)
+                        if job is None:
+                            continue
+                    return job, None
+                with self._lock:
+                    task = None
+                    for index, (_, current) in enumerate(self._workers):
+                        if current is connection:
+                            task = self._tasks[index]
+                            self._tasks[index] = None
+                    if task is None:
+                        continue
+                    if name == 'failed':
+                        # the worker reports an error instead of a result
+                        self._fail(task[1], result)
+                        self._dispatch()
+                        return task[1], None
+                    name, job, index = task
+                    if name == 'activations':
+                        if job in self._chunks:
+                            chunks = self._chunks[job]
+                            chunks[index] = result
+                            if all(chunk is not None for chunk in chunks):
+                                self._push(job, 'decode')
+                        self._dispatch()
+                        continue
+                    self._chunks.pop(job, None)
+                    self._dispatch()
+                return job, result
+
+
+def _start_worker(processor, settings, connection):
+    """Loads the settings and runs the processor in a worker process."""
+    load(settings)
+    processor.run(connection)
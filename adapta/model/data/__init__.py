@@ -1,3 +1,5 @@
 from adapta.model.data.audio import Audio
+from adapta.model.data.audiocache import AudioCache
+from adapta.model.data.segmentcache import SegmentCache
 from adapta.model.data.track import Track
 from adapta.model.data.mix import Mix
@@ -183,10 +183,11 @@ class Audio(signal.Signal):
                 return np.right_shift(audio, shift_bits).astype(dtype)
         if match(np.floating, np.signedinteger):
             # float to int
-            return (audio * intmax(dtype)).astype(dtype)
+            return np.multiply(audio, intmax(dtype, audio.dtype),
+                               dtype=audio.dtype).astype(dtype)
         if match(np.signedinteger, np.floating):
             # int to float
-            return (audio / intmax(audio.dtype)).astype(dtype)
+            return np.divide(audio, intmax(audio.dtype), dtype=dtype)
 
         # no match found
         raise ValueError("incompatible dtypes")
@@ -0,0 +1,56 @@
+import numpy as np
+
+from adapta.model.data import Audio
+from adapta.util import hash_file, use_settings, Cache
+
+
+@use_settings
+class AudioCache(Cache):
+    """Persistent cache of decoded audio files. Entries are identified by the
+    content of the audio file and the format it is decoded to, and are served
+    as memory-mapped, read-only views of the cache files.
+
+    """
+
+    def load(self, path, sample_rate, num_channels, dtype):
+        """Fetches the decoded samples of an audio file. The file only gets
+        decoded if it is not cached yet.
+
+        Parameters
+        ----------
+        path : str
+            The path to the audio file.
+        sample_rate : int
+            The sample rate to decode to in Hertz.
+        num_channels : int
+            The number of channels to decode to.
+        dtype : numpy dtype
+            The data type of the decoded samples.
+
+        Returns
+        -------
+        :class:`Audio`
+            The decoded audio.
+
+        """
+
+        dtype = np.dtype(dtype)
+        key = self.key(hash_file(path), sample_rate, num_channels, dtype.str)
+        data = self.get(key)
+        if data is None:
+            data = Audio(path,
+                         sample_rate=sample_rate,
+                         num_channels=num_channels,
+                         dtype=dtype)
+            self.put(key, data)
+            # serve from the cache file so that the decoded copy can be freed
+            cached = self.get(key)
+            if cached is None:
+                return data
+            data = cached
+        audio = data.view(Audio)
+        audio.sample_rate = sample_rate
+        return audio
+
+    def read(self, path):
+        return np.load(path, mmap_mode='r')
@@ -1,12 +1,22 @@
+from collections import deque
+from concurrent import futures as cf
 import json
-from madmom.io import audio
+import multiprocessing
 import numpy as np
 import os
 from pyqtgraph.Qt import QtCore
+import struct
+import threading
+import wave
+from warnings import warn
 
-from adapta.model.data import Audio, Track
-from adapta.model.automation import parse, Tempo
-from adapta.util import round_, int_, singleton, use_settings, Threadable
+from adapta.model.data import Audio, AudioCache, SegmentCache, Track
+from adapta.model.automation import changes, parse, Tempo
+from adapta.model.beatdetection import BeatCache, GridEstimator
+from adapta.model.stretching import Resampler, Wsola
+from adapta.util import (
+    dump, load, round_, int_, intmax, float_, singleton, use_settings,
+    Threadable)
 
 
 @singleton
@@ -28,18 +38,69 @@ class Mix(Threadable):
     bit_width = int
     # number of mix channels
     num_channels = int
-    # use resampling for time stretching
+    # bit width of samples during processing in bit
+    float_width = int
+    # use resampling for time stretching instead of pitch preserving
+    # waveform similarity overlap-add
     use_resampling = bool
+    # number of threads preparing tracks, or null to use the default
+    num_workers = int
+    # number of threads rendering segments, or null to use the default
+    num_renderers = int
+    # stretch the tracks of a segment in parallel
+    parallel_tracks = bool
+    # maximum number of preceding segments stretched again before a segment
+    # following cached segments, so that the stretched audio continues them
+    stretch_warmup = int
+    # apply changes of automation files while the mix is loaded
+    watch_automation = bool
+    # number of processes rendering the mix to a file, or null to use one per
+    # CPU
+    render_processes = int
 
     """ Signals """
     sig_loaded = QtCore.Signal(object)
-    sig_updated = QtCore.Signal(object)
-    sig_segment = QtCore.Signal(object)
+    sig_updated = QtCore.Signal(object, int, int)
+    sig_segment = QtCore.Signal(int, int)
     sig_request_beats = QtCore.Signal(object)
+    sig_prepared = QtCore.Signal(object)
+    sig_estimated = QtCore.Signal(object, object)
+    sig_invalidated = QtCore.Signal(int, int)
+    sig_progress = QtCore.Signal(int, int)
+    sig_rendered = QtCore.Signal(bool)
 
     def __init__(self):
         super().__init__()
         self._tracks = {}
+        self._futures = []
+        # whether the beats tracks are prepared with are provisional
+        self._provisional = {}
+        # tracks prepared with final beats replacing provisional ones
+        self._replacements = {}
+        self._pool = cf.ThreadPoolExecutor(self.num_workers)
+        self._estimator = GridEstimator()
+        # streaming stretchers of the tracks
+        self._streams = {}
+        # rendered segments
+        self._segments = SegmentCache()
+        self._renderer = cf.ThreadPoolExecutor(self.num_renderers)
+        self._stretcher = cf.ThreadPoolExecutor()
+        # reusable buffers the rendering threads mix segments in
+        self._scratch = threading.local()
+        # pending renderings with their segment index and tracks
+        self._renders = []
+        # indeces of the scheduled segments of each track in order
+        self._queues = {}
+        self._condition = threading.Condition()
+        # set to abort rendering the mix to a file
+        self._abort = threading.Event()
+        # watched automation files and the names of the tracks using them,
+        # where 'None' refers to the mix
+        self._watched = {}
+        self._watcher = QtCore.QFileSystemWatcher(self)
+        self._watcher.fileChanged.connect(self._reload)
+        self.sig_prepared.connect(self._add_track)
+        self.sig_estimated.connect(self._receive_estimate)
 
     def load(self, path):
         """Creates mix from the given json file.
@@ -60,64 +121,280 @@ class Mix(Threadable):
         # allow file paths relative to mix file
         os.chdir(os.path.dirname(os.path.abspath(path)))
 
+        # drop tracks of the previous mix that are still being prepared
+        for future in self._futures:
+            future.cancel()
+        self._futures.clear()
+        self._provisional.clear()
+        self._replacements.clear()
+        self._streams.clear()
+        self._segments.clear()
+
         # update the tracks of the mix
         self._tracks.clear()
-        self._todo = []
         for name, params in mix['tracks'].items():
-            track = Track(self, params)
-            self._tracks[name] = track
-            if not track.initialized:
-                self._todo.append((name, track))
-
-        self._todo.sort(key=lambda x: x[1].position)
-        todo = [(name, track._params['audio']) for name, track in self._todo]
+            self._tracks[name] = Track(self, params)
+
+        # prepare the tracks in order of their position
+        # so that playback can start as soon as the first tracks are ready
+        # and only request beat detection for tracks without known beats,
+        # which are meanwhile prepared with a quickly estimated beat grid
+        cache = BeatCache()
+        tracks = sorted(self._tracks.values(), key=lambda x: x.position)
+        todo = []
+        for track in tracks:
+            beats = track.beats
+            if beats is None:
+                beats = cache.load(*track.job)
+            if beats is None:
+                todo.append((track.position, track.job))
+                if self._estimator.enabled:
+                    self._estimate(track)
+            else:
+                self._prepare(track, beats)
         self.sig_request_beats.emit(todo)
 
         self._automation = parse(mix['automation'])
         self._tempo = Tempo(self)
+        self._watch(mix['automation'])
 
         self.sig_loaded.emit(self)
         self.update()
         self.unlock()
 
-    def receive_beats(self, track, beats):
-        """Updates contained tracks with newly computed beats."""
-        self._tracks[track].init(beats)
+    def _watch(self, automation):
+        """Watches the automation files of the mix and its tracks."""
+        self._watched = {}
+        if self.watch_automation:
+            self._watched[os.path.abspath(automation)] = [None]
+            for name, track in self._tracks.items():
+                path = track._params.get('automation')
+                if path is not None:
+                    self._watched.setdefault(path, []).append(name)
+        files = self._watcher.files()
+        if len(files) > 0:
+            self._watcher.removePaths(files)
+        if len(self._watched) > 0:
+            self._watcher.addPaths(list(self._watched))
+
+    def _reload(self, path):
+        """Applies the changes of a watched automation file. Only segments
+        between changed nodes are invalidated.
+
+        """
+
+        # files replaced on saving need to be watched again
+        if os.path.exists(path) and path not in self._watcher.files():
+            self._watcher.addPath(path)
+        try:
+            automation = parse(path)
+        except (OSError, IndexError, ValueError) as error:
+            warn('could not reload automation {}: {}'.format(path, error))
+            return
+
+        self.lock()
+        try:
+            for name in self._watched.get(path, []):
+                try:
+                    self._apply(name, automation)
+                except Exception as error:
+                    # keep the previous automation until the file is valid
+                    warn('could not apply automation {}: {}'.format(
+                        path, error))
+        finally:
+            self.unlock()
+
+    def _apply(self, name, automation):
+        """Replaces the automation of the mix or of a track, and invalidates
+        the changed segments. Nothing is replaced if the automation is
+        invalid.
+
+        """
+
+        if name is None:
+            changed = changes(self._automation.get('Tempo', []),
+                              automation.get('Tempo', []))
+            previous = self._automation
+            self._automation = automation
+            if changed is not None:
+                # the update reports the segments shifted in time
+                try:
+                    self.update()
+                except Exception:
+                    self._automation = previous
+                    raise
+            return
+        track = self._tracks.get(name)
+        if track is None or not track.initialized:
+            return
+        changed = track.update_automation(automation)
+        if changed is not None:
+            # buffered segments of the track are outdated
+            self._streams.pop(track, None)
+            start, stop = changed
+            self._invalidate(track.to_global(start), track.to_global(stop))
+
+    def receive_beats(self, job, beats, provisional=False):
+        """Updates contained tracks with newly computed beats.
+
+        Parameters
+        ----------
+        job : tuple
+            The beat detection job the beats belong to.
+        beats : numpy array
+            The beat positions in seconds, or 'None' if the detection failed.
+            Tracks prepared with provisional beats keep them in that case.
+        provisional : bool, optional
+            Flag determining whether the beats are a provisional estimate.
+            Provisional beats are only used for tracks without beats, final
+            beats replace provisional ones.
+
+        """
+
+        if beats is None:
+            return
+        for track in list(self._tracks.values()):
+            if track.job != job or self._provisional.get(track) is False:
+                continue
+            if provisional:
+                if track not in self._provisional:
+                    self._provisional[track] = True
+                    self._prepare(track, beats)
+                continue
+            if self._provisional.get(track):
+                # swap the track once it is prepared with the final beats
+                replacement = track.copy()
+                self._replacements[replacement] = track
+                self._provisional[track] = False
+                track = replacement
+            self._provisional[track] = False
+            self._prepare(track, beats)
+
+    def _receive_estimate(self, job, beats):
+        """Passes provisional beats on to the tracks in the mix thread."""
+        self.receive_beats(job, beats, True)
+
+    def _estimate(self, track):
+        """Estimates provisional beats of a track in a worker thread."""
+        path, start, stop = track.job
+
+        def estimate():
+            audio = AudioCache().load(path,
+                                      self.sample_rate,
+                                      self.num_channels,
+                                      float_(track.float_width))
+            return self._estimator.process(audio, start, stop)
+
+        future = self._pool.submit(estimate)
+        future.add_done_callback(lambda x: self._estimated(track, x))
+        self._futures.append(future)
+
+    def _estimated(self, track, future):
+        """Notifies the mix thread about a finished beat estimation."""
+        if future.cancelled():
+            return
+        if future.exception() is not None:
+            warn('could not estimate beats of track {}: {}'.format(
+                track._params['audio'], future.exception()))
+            return
+        self.sig_estimated.emit(track.job, future.result())
+
+    def _prepare(self, track, beats):
+        """Initializes a track in a worker thread."""
+        future = self._pool.submit(track.init, beats)
+        future.add_done_callback(lambda x: self._prepared(track, x))
+        self._futures.append(future)
+
+    def _prepared(self, track, future):
+        """Notifies the mix thread about a finished track preparation."""
+        if future.cancelled():
+            return
+        if future.exception() is not None:
+            warn('could not prepare track {}: {}'.format(
+                track._params['audio'], future.exception()))
+            return
+        self.sig_prepared.emit(track)
+
+    def _add_track(self, track):
+        """Adds a prepared track to the timeline of the mix."""
+        self._futures = [future for future in self._futures
+                         if not future.done()]
+        original = self._replacements.pop(track, None)
+        if original is None:
+            if track in self._tracks.values():
+                self.update()
+            return
+
+        # replace the track prepared with provisional beats
+        # and invalidate the segments it encompasses
+        for name, current in self._tracks.items():
+            if current is original:
+                break
+        else:
+            return
+        self.lock()
+        self._tracks[name] = track
+        self._streams.pop(original, None)
+        self.unlock()
         self.update()
+        num_segments = track.num_segments
+        if original.initialized:
+            num_segments = max(num_segments, original.num_segments)
+        self._invalidate(track.position, track.position + num_segments)
+
+    def _invalidate(self, start, stop):
+        """Discards rendered samples of changed segments."""
+        # the stretchers take context from the neighbouring segments
+        self._segments.invalidate(max(start - 1, 0), stop + 1)
+        self.sig_invalidated.emit(start, stop)
 
     def update(self):
         """Update beats and accordingly mix beat positions and sample indeces.
+        Only the beat positions following tempo nodes that were added or
+        changed since the last update are computed again. The range of
+        segments whose positions changed is sent along with the mix.
 
         """
 
         self.lock()
-        # load the tempo of the mix
-        # and calculate the beat positions
-        automation = self._automation['Tempo']
-        index = None
-        for i in range(len(automation)):
-            track = self._tracks[automation[i][1]]
-            if not track.initialized:
-                index = i
-                break
-            is_constant = len(
-                automation[i]) < 4 or automation[i][3] == 'constant'
-            if not is_constant and i + 1 < len(automation):
-                next_track = self._tracks[automation[i + 1][1]]
-                if not next_track.initialized:
+        try:
+            # load the tempo of the mix
+            # and calculate the beat positions
+            automation = self._automation['Tempo']
+            index = None
+            for i in range(len(automation)):
+                track = self._tracks[automation[i][1]]
+                if not track.initialized:
                     index = i
                     break
-        automation = automation[:index]
-
-        self._times = self._tempo(automation)
-        self._times.setflags(write=False)
-
-        # calculate corresponding sample indeces
-        self._sample_indeces = round_(self._times * self.sample_rate)
-        self._sample_indeces.setflags(write=False)
-
-        self.sig_updated.emit(self)
-        self.unlock()
+                is_constant = len(
+                    automation[i]) < 4 or automation[i][3] == 'constant'
+                if not is_constant and i + 1 < len(automation):
+                    next_track = self._tracks[automation[i + 1][1]]
+                    if not next_track.initialized:
+                        index = i
+                        break
+            automation = automation[:index]
+
+            num_segments = 0
+            if hasattr(self, '_times'):
+                num_segments = self._times.size - 1
+            self._times, start = self._tempo.update(automation)
+            if start < num_segments:
+                # the stretchers take context from the preceding segment
+                self._segments.invalidate(max(start - 1, 0))
+
+            # calculate corresponding sample indeces of the changed positions
+            sample_indeces = round_(self._times[start:] * self.sample_rate)
+            if start > 0:
+                sample_indeces = np.concatenate(
+                    (self._sample_indeces[:start], sample_indeces))
+            self._sample_indeces = sample_indeces
+            self._sample_indeces.setflags(write=False)
+
+            self.sig_updated.emit(self, start, self._times.size - 1)
+        finally:
+            self.unlock()
 
     @property
     def tracks(self):
@@ -139,7 +416,7 @@ class Mix(Threadable):
     def num_segments(self):
         """Total number of segments of the mix."""
         if hasattr(self, '_times'):
-            candidates = [track.position for name, track in self._todo
+            candidates = [track.position for track in self._tracks.values()
                           if not track.initialized]
             candidates.append(self._times.size - 1)
             return min(candidates)
@@ -205,71 +482,228 @@ class Mix(Threadable):
 
         if index >= self.num_segments:
             return np.empty(0, dtype=int_(self.bit_width))
+        return self._render(*self._schedule(index))
+
+    def _schedule(self, index):
+        """Reserves the turn of a segment in the streams of its tracks, such
+        that the segments of each track are stretched in the order they are
+        scheduled in.
+
+        Returns
+        -------
+        tuple
+            The index of the segment, its tracks and its number of samples.
 
+        """
+
+        self.lock()
+        tracks = [track for track in self._tracks.values()
+                  if track.available(index, local=False)]
         num_samples = self.num_samples(index)
-        # prepare resulting array
-        shape = self.num_samples(index)
+        self.unlock()
+        with self._condition:
+            for track in tracks:
+                self._queues.setdefault(track, deque()).append(index)
+        return index, tracks, num_samples
+
+    def _release(self, index, track):
+        """Passes the turn of a segment in the stream of a track on."""
+        with self._condition:
+            queue = self._queues[track]
+            queue.remove(index)
+            if len(queue) == 0:
+                del self._queues[track]
+            self._condition.notify_all()
+
+    def _render(self, index, tracks, num_samples, out=None):
+        """Mixes and time stretches a scheduled segment. The tracks are mixed
+        in a reusable buffer of the calling thread, and the samples are
+        converted to the output format while they are written. Can be called
+        from any thread.
+
+        Parameters
+        ----------
+        out : :class:`Reservation`, optional
+            The buffer space to write the samples into.
+
+        Returns
+        -------
+        :class:`Audio`
+            The samples of the segment, or 'None' if they are only written
+            into the given buffer space and not cached.
+
+        """
+
+        shape = num_samples
         if self.num_channels > 1:
             shape = (shape, self.num_channels)
-        result = np.zeros(shape, dtype=np.float_).view(Audio)
-        result.sample_rate = self.sample_rate
-
-        def mix(track):
-            """Time stretches a specified track.
-
-            Parameters
-            ----------
-            track: :class: `Track`
-                The track to be mixed and time stretched.
-
-            Returns
-            -------
-            :class: `Audio`
-                The mixed and time stretched audio of the specified track.
-
-            """
-
-            # fetch the audio segment from the track
-            segment = track.segments(index, local=False)
-
-            # time stretching
-            if num_samples != segment.num_samples:
-                if self.use_resampling:
-                    ratio = num_samples / segment.num_samples
-                    segment = segment.resample(ratio * self.sample_rate)
-                else:
-                    import pyrubberband as pyrb
-                    ratio = segment.num_samples / num_samples
-                    stretched = np.apply_along_axis(
-                        lambda x: pyrb.time_stretch(x, segment.sample_rate,
-                                                    ratio),
-                        0, segment)
-                    stretched = stretched.view(Audio)
-                    stretched.sample_rate = segment.sample_rate
-                    return stretched
-
-            return segment
-
-        # time stretch the fetched segments of each track
-        tracks = [track for track in self._tracks.values()
-                  if track.available(index, local=False)]
-        for segment in map(mix, tracks):
-            min_length = min(segment.num_samples, result.num_samples)
-            result[:min_length] += segment[:min_length]
+        result = self._mixing_buffer(shape)
+        result.fill(0)
+
+        def stretch(track):
+            """Time stretches the segment of a track in its turn."""
+            try:
+                return self._stretch(track, index, num_samples)
+            finally:
+                self._release(index, track)
+
+        # time stretch the segments of each track in turn, where waiting for
+        # the turn before submitting keeps the stretching threads from
+        # blocking each other
+        futures = []
+        for track in tracks:
+            with self._condition:
+                self._condition.wait_for(
+                    lambda: self._queues[track][0] == index)
+            if self.parallel_tracks and len(tracks) > 1:
+                futures.append(self._stretcher.submit(stretch, track))
+            else:
+                result += stretch(track)
+        # sum in the order of the tracks to get reproducible results
+        for future in futures:
+            result += future.result()
+
+        # limit the resulting values and scale them to the integer range
+        np.clip(result, -1, 1, out=result)
+        dtype = int_(self.bit_width)
+        np.multiply(result, intmax(dtype, result.dtype), out=result)
+
+        if out is not None and not self._segments.enabled:
+            out.write(result.reshape(-1))
+            return None
+        segment = np.empty(shape, dtype=dtype).view(Audio)
+        segment.sample_rate = self.sample_rate
+        np.copyto(segment, result, casting='unsafe')
+        if out is not None:
+            out.write(segment.reshape(-1))
+        return segment
+
+    def _mixing_buffer(self, shape):
+        """Reusable float buffer of the calling thread of the given shape."""
+        size = int(np.prod(shape))
+        buffer = getattr(self._scratch, 'buffer', None)
+        if buffer is None or buffer.shape[0] < size:
+            buffer = np.empty(size, dtype=float_(self.float_width))
+            self._scratch.buffer = buffer
+        return buffer[:size].reshape(shape)
+
+    def _stretch(self, track, index, num_samples):
+        """Time stretches a segment of a track to the given number of samples.
+        The segments of a track are fed to a streaming stretcher in order,
+        ahead of the stretched segment as far as the stretcher needs context.
+        A new stream is started whenever a segment does not follow the
+        previously stretched one. If the preceding segments were taken from
+        the cache meanwhile, they are stretched again and discarded, so that
+        the segment continues them seamlessly. Streams lagging further behind
+        are started anew ahead of the segment, which only continues the
+        cached segments exactly near the start of the track.
+
+        """
+
+        stream = self._streams.get(track)
+        if stream is None or stream[1] != index:
+            start = index
+            if (stream is not None
+                    and index - self.stretch_warmup <= stream[1] < index):
+                start = stream[1]
+            elif index - 1 in self._segments:
+                start = max(index - self.stretch_warmup, track.position, 0)
+            if stream is None or stream[1] != start:
+                cls = Resampler if self.use_resampling else Wsola
+                stretcher = cls(self.sample_rate, self.num_channels,
+                                float_(self.float_width))
+                if track.available(start - 1, local=False):
+                    stretcher.reset(track.segments(start - 1, local=False))
+                # the stretcher, the next segment to stretch and to fetch
+                stream = [stretcher, start, start]
+                self._streams[track] = stream
+            while stream[1] < index:
+                self._continue(track, stream, self.num_samples(stream[1]))
+        return self._continue(track, stream, num_samples)
+
+    @staticmethod
+    def _continue(track, stream, num_samples):
+        """Time stretches the next segment of the stream of a track."""
+        stretcher = stream[0]
+        num_input = track.num_samples(stream[1], local=False)
+        while not stretcher.ready(num_input, num_samples):
+            if track.available(stream[2], local=False):
+                stretcher.feed(track.segments(stream[2], local=False))
+                stream[2] += 1
+            else:
+                stretcher.finish()
+        stream[1] += 1
+        return stretcher.process(num_input, num_samples)
+
+    def send_segment(self, index, generation, reservation):
+        """Writes the audio samples of a segment into reserved buffer space and
+        notifies the receiver. Segments are rendered by a pool of threads, so
+        that following segments can be requested before preceding ones are
+        finished. Rendered segments are cached until their inputs change.
+
+        Parameters
+        ----------
+        index : int
+            The index of the segment.
+        generation : int
+            An identifier of the request, which is sent back with the
+            notification.
+        reservation : :class:`Reservation`
+            The buffer space to write the samples into.
 
-        # limit the resulting values
-        result = result.clip(-1.0, 1.0)
+        """
+
+        segment = self._segments.get(index)
+        if segment is None and index >= self.num_segments:
+            # segments beyond the end of the mix are silent
+            segment = np.empty(0, dtype=int_(self.bit_width))
+        if segment is not None:
+            reservation.write(segment.reshape(-1))
+            self.sig_segment.emit(index, generation)
+            return
+
+        version = self._segments.version
+        args = self._schedule(index)
+        future = self._renderer.submit(self._render, *args, reservation)
+        with self._condition:
+            self._renders = [x for x in self._renders if not x[0].done()]
+            self._renders.append((future, index, args[1]))
+        future.add_done_callback(lambda x: self._rendered(
+            args, generation, version, reservation, x))
+
+    def _rendered(self, args, generation, version, reservation, future):
+        """Caches a rendered segment and notifies the receiver. Failed
+        segments are replaced by silence, so that the following segments can
+        be played.
 
-        # rescale audio to required format
-        result = result.rescale(int_(self.bit_width))
-        return result
+        """
 
-    def send_segment(self, index):
-        """Fetch audio samples of a segment and send it."""
-        self.sig_segment.emit(self.segment(index))
+        if future.cancelled():
+            return
+        index = args[0]
+        if future.exception() is not None:
+            warn('could not render segment {}: {}'.format(
+                index, future.exception()))
+            reservation.write(np.empty(0, dtype=int_(self.bit_width)))
+        elif future.result() is not None:
+            self._segments.put(index, version, future.result())
+        self.sig_segment.emit(index, generation)
+
+    def cancel(self):
+        """Cancels renderings of segments that have not started yet."""
+        with self._condition:
+            for future, index, tracks in self._renders:
+                if future.cancel():
+                    for track in tracks:
+                        self._release(index, track)
+            self._renders = [x for x in self._renders if not x[0].done()]
 
     def render(self, path):
-        """Writes the whole mix to a file.
+        """Writes the whole mix to a wave file. The memory usage does not
+        depend on the length of the mix, and the progress is reported while
+        rendering. If several render processes are configured, ranges of
+        segments are rendered in parallel, otherwise each segment is written
+        as soon as it is rendered.
 
         Parameters
         ----------
@@ -278,12 +712,247 @@ class Mix(Threadable):
 
         """
 
-        # fetch and concatenate all segments
-        segments = []
-        for i in range(self.num_segments):
-            segment = self.segment(i)
-            segments.append(segment)
-        mix = np.concatenate(segments)
+        self._abort.clear()
+        num_processes = self.render_processes or os.cpu_count() or 1
+        completed = False
+        try:
+            # the processes share the decoded audio through the audio cache
+            if num_processes > 1 and AudioCache().enabled:
+                completed = self._render_processes(path, num_processes)
+            else:
+                completed = self._render_serially(path)
+        finally:
+            if not completed and os.path.exists(path):
+                os.remove(path)
+            self.sig_rendered.emit(completed)
+
+    def _render_serially(self, path):
+        """Renders the segments in order and appends them to the file."""
+        num_segments = self.num_segments
+        with wave.open(path, 'wb') as file:
+            file.setnchannels(self.num_channels)
+            file.setsampwidth(self.bit_width // 8)
+            file.setframerate(self.sample_rate)
+            # the sizes in the header are updated when the file is closed
+            for index in range(num_segments):
+                if self._abort.is_set():
+                    return False
+                segment = self._segments.get(index)
+                if segment is None:
+                    segment = self.segment(index)
+                file.writeframes(_wave_samples(segment).tobytes())
+                self.sig_progress.emit(index + 1, num_segments)
+        return True
+
+    def _render_processes(self, path, num_processes):
+        """Renders ranges of segments in worker processes, which write them
+        into their region of the memory-mapped output file. The streams of
+        the tracks are stretched from their start before the first segment of
+        a range, so that the result equals rendering the mix in order.
+
+        """
+
+        self.lock()
+        num_segments = self.num_segments
+        times = self._times[:num_segments + 1]
+        tracks = [track for track in self._tracks.values()
+                  if track.initialized and track.position < num_segments]
+        state = (times, self._sample_indeces[:num_segments + 1],
+                 [(track.state, track.num_segments) for track in tracks])
+        self.unlock()
+        if num_segments == 0:
+            return self._render_serially(path)
+
+        # allocate the file, whose samples are written by the processes
+        num_frames = int(state[1][-1] - state[1][0])
+        sample_width = self.bit_width // 8
+        with open(path, 'wb') as file:
+            file.write(_wave_header(num_frames, self.num_channels,
+                                    self.sample_rate, sample_width))
+            file.truncate(file.tell()
+                          + num_frames * self.num_channels * sample_width)
+
+        # each process renders one range, so that only the tracks playing at
+        # the start of the ranges are stretched in advance
+        ranges = self._split(num_segments, num_processes,
+                             [(track.position, track.num_segments)
+                              for track in tracks])
+        context = multiprocessing.get_context('spawn')
+        counter = context.Value('i', 0)
+        abort = context.Event()
+        executor = cf.ProcessPoolExecutor(
+            len(ranges), context, initializer=_start_renderer,
+            initargs=(dump(), state, counter, abort))
+        pending = [executor.submit(_render_range, path, start, stop)
+                   for start, stop in ranges]
+        num_rendered = 0
+        try:
+            while len(pending) > 0:
+                if self._abort.is_set():
+                    return False
+                done, _ = cf.wait(pending, 0.1, cf.FIRST_COMPLETED)
+                for future in done:
+                    # errors of the processes are raised here
+                    future.result()
+                    pending.remove(future)
+                if counter.value > num_rendered:
+                    num_rendered = counter.value
+                    self.sig_progress.emit(num_rendered, num_segments)
+        finally:
+            # after an abort or an error of a process, the other processes
+            # stop and ranges that have not started are not rendered
+            if len(pending) > 0:
+                abort.set()
+            for future in pending:
+                future.cancel()
+            executor.shutdown(len(pending) == 0)
+        return True
+
+    @staticmethod
+    def _split(num_segments, num_chunks, tracks):
+        """Splits the segments into ranges of about equal length. The ranges
+        start where the least segments have to be stretched in advance, which
+        are the segments of the tracks before the start of the range.
+
+        Parameters
+        ----------
+        num_segments : int
+            The number of segments of the mix.
+        num_chunks : int
+            The number of ranges to split into.
+        tracks : list
+            The position and number of segments of each track.
+
+        Returns
+        -------
+        list
+            The start and stop index of each range.
+
+        """
+
+        warmup = np.zeros(num_segments + 1)
+        for position, length in tracks:
+            begin = max(position, 0)
+            stop = min(position + length, num_segments)
+            if begin < stop:
+                warmup[begin:stop] += np.arange(stop - begin)
+        # moving a boundary by one segment costs about as much as stretching
+        # another segment in advance
+        width = num_segments // (2 * num_chunks)
+        boundaries = [0]
+        for i in range(1, num_chunks):
+            ideal = i * num_segments // num_chunks
+            lower = max(ideal - width, boundaries[-1] + 1)
+            upper = min(ideal + width + 1, num_segments)
+            if lower >= upper:
+                continue
+            candidates = np.arange(lower, upper)
+            costs = warmup[lower:upper] + np.abs(candidates - ideal)
+            boundaries.append(int(candidates[np.argmin(costs)]))
+        boundaries.append(num_segments)
+        return list(zip(boundaries[:-1], boundaries[1:]))
+
+    def _restore(self, times, sample_indeces, tracks, counter, abort):
+        """Restores the timeline and the tracks of a mix in a render process.
+        Tracks are only initialized once they are rendered.
+
+        """
+
+        # number of segments rendered by all processes
+        self._counter = counter
+        self._abort = abort
+        self._times = times
+        self._sample_indeces = sample_indeces
+        self._tracks = {}
+        # beats and number of segments of the tracks to initialize
+        self._restored = {}
+        for i, ((params, beats), num_segments) in enumerate(tracks):
+            track = Track(self, params)
+            self._tracks[i] = track
+            self._restored[track] = (beats, num_segments)
+
+    def _render_range(self, path, start, stop):
+        """Renders a range of segments into the memory-mapped output file in
+        a render process.
+
+        """
+
+        for track, (beats, num_segments) in self._restored.items():
+            if (not track.initialized and track.position < stop
+                    and start < track.position + num_segments):
+                track.init(beats)
+        # continue the streams of the tracks from their start in the order
+        # of a serial rendering, unless the previous range was rendered
+        for track in self._tracks.values():
+            if not track.available(start, local=False):
+                continue
+            stream = self._streams.get(track)
+            if stream is not None and stream[1] == start:
+                continue
+            self._streams.pop(track, None)
+            for index in range(max(track.position, 0), start):
+                self._stretch(track, index, self.num_samples(index))
+
+        # the samples follow the header of 44 bytes
+        offset = self._sample_indeces[0]
+        samples = np.memmap(path, _wave_dtype(self.bit_width), 'r+', 44,
+                            (self._sample_indeces[-1] - offset,
+                             self.num_channels))
+        for index in range(start, stop):
+            if self._abort.is_set():
+                return
+            segment = _wave_samples(self._render(*self._schedule(index)))
+            begin = self._sample_indeces[index] - offset
+            samples[begin:begin + segment.shape[0]] = segment.reshape(
+                -1, self.num_channels)
+            with self._counter.get_lock():
+                self._counter.value += 1
+        samples.flush()
+
+    def abort_render(self):
+        """Aborts rendering the mix to a file, which is removed. Can be called
+        from any thread.
+
+        """
+
+        self._abort.set()
+
+
+def _wave_dtype(bit_width):
+    """Data type of the samples of wave files, which are little-endian and
+    unsigned for a bit width of 8.
+
+    """
+
+    if bit_width == 8:
+        return np.dtype(np.uint8)
+    return np.dtype(int_(bit_width)).newbyteorder('<')
+
+
+def _wave_samples(segment):
+    """Converts samples to the data type of wave files."""
+    dtype = _wave_dtype(8 * segment.dtype.itemsize)
+    if dtype.kind == 'u':
+        return (segment.astype(np.int16) + 128).astype(dtype)
+    return segment.astype(dtype, copy=False)
+
+
+def _wave_header(num_frames, num_channels, sample_rate, sample_width):
+    """Header of a wave file with the given format and number of samples."""
+    block_size = num_channels * sample_width
+    num_bytes = num_frames * block_size
+    return struct.pack('<4sI4s4sIHHIIHH4sI', b'RIFF', 36 + num_bytes, b'WAVE',
+                       b'fmt ', 16, 1, num_channels, sample_rate,
+                       sample_rate * block_size, block_size,
+                       8 * sample_width, b'data', num_bytes)
+
+
+def _start_renderer(settings, state, counter, abort):
+    """Loads the settings and restores the mix in a render process."""
+    load(settings)
+    Mix()._restore(*state, counter, abort)
+
 
-        # write to file
-        audio.write_wave_file(mix, path, self.sample_rate)
+def _render_range(path, start, stop):
+    """Renders a range of segments of the mix in a render process."""
+    Mix()._render_range(path, start, stop)
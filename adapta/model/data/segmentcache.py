@@ -0,0 +1,139 @@
+from collections import OrderedDict
+import threading
+
+from adapta.util import use_settings
+
+
+@use_settings
+class SegmentCache:
+    """In-memory cache of rendered mix segments. Whenever the total size of
+    all entries exceeds the capacity of the cache, entries are evicted in
+    least recently used order.
+
+    Each entry is stored with the version of the cache it was rendered at.
+    Invalidating a range of segments increments the version, so that
+    segments whose rendering started before an invalidation of their index
+    are rejected when they are stored.
+
+    """
+
+    """ Settings """
+    # enable the cache
+    enabled = bool
+    # cache capacity in MB
+    size = int
+
+    # number of remembered invalidations
+    history_size = 64
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._num_bytes = 0
+        self._version = 0
+        # recent invalidations as version, start and stop
+        self._invalidations = []
+
+    @property
+    def capacity(self):
+        """Number of bytes the cache can store."""
+        return self.size * 1024 ** 2
+
+    @property
+    def version(self):
+        """Current version of the cached segments."""
+        return self._version
+
+    def get(self, index):
+        """Fetches a cached segment.
+
+        Parameters
+        ----------
+        index : int
+            The index of the segment.
+
+        Returns
+        -------
+        numpy array
+            The read-only samples of the segment, or 'None' if the segment is
+            not cached.
+
+        """
+
+        with self._lock:
+            entry = self._entries.get(index)
+            if entry is None:
+                return None
+            # mark entry as recently used
+            self._entries.move_to_end(index)
+            return entry[1]
+
+    def __contains__(self, index):
+        """True iff the segment of the given index is cached."""
+        with self._lock:
+            return index in self._entries
+
+    def put(self, index, version, segment):
+        """Stores a rendered segment and evicts old entries if necessary.
+
+        Parameters
+        ----------
+        index : int
+            The index of the segment.
+        version : int
+            The version of the cache when the rendering of the segment
+            started.
+        segment : numpy array
+            The samples of the segment. They must not be changed afterwards.
+
+        """
+
+        if not self.enabled or segment.nbytes > self.capacity:
+            return
+        with self._lock:
+            if version < self._version:
+                if (len(self._invalidations) == 0
+                        or version + 1 < self._invalidations[0][0]):
+                    # the invalidations since then are not known anymore
+                    return
+                for changed, start, stop in self._invalidations:
+                    if (changed > version and start <= index
+                            and (stop is None or index < stop)):
+                        return
+            segment.setflags(write=False)
+            self._remove(index)
+            self._entries[index] = (version, segment)
+            self._num_bytes += segment.nbytes
+            while self._num_bytes > self.capacity:
+                self._remove(next(iter(self._entries)))
+
+    def invalidate(self, start=0, stop=None):
+        """Removes the segments of a range.
+
+        Parameters
+        ----------
+        start : int, optional
+            The index of the first segment.
+        stop : int, optional
+            The index of the segment after the last segment, or 'None' to
+            remove all following segments.
+
+        """
+
+        with self._lock:
+            self._version += 1
+            self._invalidations.append((self._version, start, stop))
+            del self._invalidations[:-self.history_size]
+            for index in list(self._entries):
+                if start <= index and (stop is None or index < stop):
+                    self._remove(index)
+
+    def clear(self):
+        """Removes all segments."""
+        self.invalidate()
+
+    def _remove(self, index):
+        """Removes a segment if it is cached."""
+        entry = self._entries.pop(index, None)
+        if entry is not None:
+            self._num_bytes -= entry[1].nbytes
@@ -1,10 +1,12 @@
 import numpy as np
 import os
+import threading
 
-from adapta.model.data import Audio
-from adapta.model.automation import parse, Equalizer, Volume
+from adapta.model.data import AudioCache
+from adapta.model.automation import changes, parse, Equalizer, Volume
 from adapta.util import (
-    load_beats, round_, time_to_bpm, time_to_seconds, use_settings)
+    bpm_to_time, db_to_ratio, float_, load_beats, round_, time_to_bpm,
+    time_to_seconds, use_settings)
 
 
 @use_settings
@@ -30,26 +32,57 @@ class Track:
     """
 
     """ Settings """
+    # sample bit width in bit
+    float_width = int
+    # minimum tempo in bpm assumed for beat detection
+    min_bpm = float
+    # time analysed before and after the used part in seconds
+    detection_margin = float
     # display audio with effects applied
     display_automation = bool
 
     def __init__(self, mix, params):
         self._mix = mix
+        self._initialized = False
+        # serializes access to the state of the effects
+        self._lock = threading.Lock()
         params['audio'] = os.path.abspath(params['audio'])
+        if params.get('automation') is not None:
+            params['automation'] = os.path.abspath(params['automation'])
         self._position = params.pop('position', 0)
         beats = params.pop('beats', None)
         self._params = params
-        if beats is not None:
-            times = load_beats(beats)
-            self.init(times)
+        self._beats = None if beats is None else load_beats(beats)
+
+    def copy(self):
+        """Creates an uninitialized track with the same parameters."""
+        params = dict(self._params, position=self._position)
+        return Track(self._mix, params)
+
+    @property
+    def state(self):
+        """Picklable parameters the initialized track can be restored from in
+        another process, where the decoded audio is loaded from the audio
+        cache.
+
+        """
+
+        params = dict(self._params, position=self._position)
+        return params, self._source_times
 
     def init(self, times):
         """Post object-creation initialization. Intended to be called when
-        beats are finished to be detected.
+        beats are finished to be detected. Can be called from any thread, the
+        track is marked as initialized only after all attributes are set.
 
         """
 
         self._init(times, **self._params)
+        # beat positions of the audio file, needed to restore the track
+        self._source_times = times
+        self._mix.lock()
+        self._initialized = True
+        self._mix.unlock()
 
     def _init(self,
               times,
@@ -75,37 +108,116 @@ class Track:
 
         times = times[start:stop]
         # initialize audio
-        self._audio = Audio(audio,
-                            sample_rate=self._mix.sample_rate,
-                            num_channels=self._mix.num_channels,
-                            start=times[0],
-                            stop=times[-1],
-                            gain=volume,
-                            dtype=np.float_)
-        self._disp = self._audio
+        audio = AudioCache().load(audio,
+                                  self._mix.sample_rate,
+                                  self._mix.num_channels,
+                                  float_(self.float_width))
         # store local times
         self._times = times - times[0]
         self._times.setflags(write=False)
         # initialize other attributes
-        self._sample_indeces = round_(self.times * self.audio.sample_rate)
+        self._sample_indeces = round_(self.times * audio.sample_rate)
         self._sample_indeces.setflags(write=False)
-
-        if automation is not None:
-            automation = parse(automation)
-            if 'Volume' in automation:
-                volume = Volume(self)
-                self._audio = volume(automation['Volume'])
-            if 'Equalizer' in automation:
-                equalizer = Equalizer(self)
-                self._audio = equalizer(automation['Equalizer'])
+        # cut the audio to the used beats
+        start_index = audio.time_to_index(times[0])
+        stop_index = start_index + self._sample_indeces[-1]
+        self._audio = audio[start_index:stop_index]
         self._audio.setflags(write=False)
-        if self.display_automation:
-            self._disp = self._audio
+        self._disp = None
+
+        # prepare effects, which are applied when segments are fetched
+        self._gain = 1.0
+        if volume is not None and volume != 0:
+            self._gain = db_to_ratio(volume)
+        self._volume = None
+        self._equalizer = None
+        self._automation = {}
+        if automation is not None:
+            self.update_automation(parse(automation))
+
+    def update_automation(self, automation):
+        """Replaces the effects whose specification has changed. If the
+        specification is invalid, the error is raised before any effect is
+        replaced.
+
+        Parameters
+        ----------
+        automation : dict
+            The parsed automation specification of the track.
+
+        Returns
+        -------
+        tuple
+            The local index of the first changed segment and of the segment
+            after the last changed segment, or 'None' if nothing changed.
+
+        """
+
+        # create all changed effects before replacing any of them,
+        # so that an invalid specification leaves the track unchanged
+        effects = {}
+        result = None
+        for name, cls in (('Volume', Volume), ('Equalizer', Equalizer)):
+            old = self._automation.get(name, [])
+            new = automation.get(name, [])
+            changed = changes(old, new)
+            if changed is None:
+                continue
+            effects[name] = None
+            if name in automation:
+                effects[name] = cls(self)
+                effects[name].load(new)
+            start, stop = changed
+            if stop is None:
+                stop = self.num_segments
+            if result is not None:
+                start = min(start, result[0])
+                stop = max(stop, result[1])
+            result = start, stop
+        with self._lock:
+            if 'Volume' in effects:
+                self._volume = effects['Volume']
+            if 'Equalizer' in effects:
+                self._equalizer = effects['Equalizer']
+        self._automation = automation
+        if result is not None and self.display_automation:
+            self._disp = None
+        return result
 
     @property
     def initialized(self):
         """True iff track has been initialized."""
-        return hasattr(self, '_audio')
+        return self._initialized
+
+    @property
+    def beats(self):
+        """Beat positions given by the beats file, or 'None'."""
+        return self._beats
+
+    @property
+    def job(self):
+        """Beat detection job of the track. Consists of the path to the audio
+        file and the region of the file that needs to be analysed, including a
+        safety margin. The region is given as start and stop in seconds, where
+        'None' refers to the boundaries of the file.
+
+        """
+
+        start = self._params.get('start')
+        length = self._params.get('length')
+        if start is None:
+            start = 0.0
+        elif isinstance(start, str):
+            start = time_to_seconds(start)
+        stop = None
+        if length is not None:
+            # the beats can at most be as far apart as the minimum tempo allows
+            stop = start + (length + 1) * bpm_to_time(self.min_bpm)
+            stop = round(stop + self.detection_margin, 3)
+        start = round(start - self.detection_margin, 3)
+        if start <= 0:
+            start = None
+        return self._params['audio'], start, stop
 
     @property
     def audio(self):
@@ -115,6 +227,10 @@ class Track:
     @property
     def display(self):
         """Samples to dispaly in the plot."""
+        if self._disp is None:
+            self._disp = self._audio
+            if self.display_automation:
+                self._disp = self.segments(0, self.num_segments)
         if self._disp.num_channels > 1:
             self._disp = self._disp.remix(1)
         return self._disp
@@ -231,7 +347,9 @@ class Track:
         return self.initialized and 0 <= start and stop <= self.num_segments
 
     def segments(self, start, stop=None, local=True):
-        """Fetches the specified segments of the track.
+        """Fetches the specified segments of the track. Effects are only
+        applied to the fetched samples. Consecutive segments are best fetched
+        in order, as the equalizer state is carried over between calls.
 
         Parameters
         ----------
@@ -256,4 +374,26 @@ class Track:
             stop = self.to_local(stop)
         start_index = self._sample_indeces[start]
         stop_index = self._sample_indeces[stop]
-        return self._audio[start_index:stop_index]
+        if (self._gain == 1 and self._volume is None
+                and self._equalizer is None):
+            return self._audio[start_index:stop_index]
+
+        audio = self._apply_volume(start_index, stop_index)
+        with self._lock:
+            equalizer = self._equalizer
+            if equalizer is not None:
+                if equalizer.position != start:
+                    warmup_index = max(start_index - equalizer.warmup, 0)
+                    equalizer.seek(
+                        self._apply_volume(warmup_index, start_index), start)
+                equalizer.apply(audio, start, stop)
+        return audio
+
+    def _apply_volume(self, start_index, stop_index):
+        """Copies the specified samples and applies volume changes."""
+        audio = np.multiply(self._audio[start_index:stop_index], self._gain,
+                            dtype=self._audio.dtype)
+        volume = self._volume
+        if volume is not None:
+            volume.apply(audio, start_index)
+        return audio
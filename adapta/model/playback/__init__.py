@@ -1,2 +1,2 @@
-from adapta.model.playback.buffer import Buffer
+from adapta.model.playback.buffer import Buffer, Reservation
 from adapta.model.playback.player import Player
@@ -1,4 +1,6 @@
+from collections import deque
 import numpy as np
+import threading
 from warnings import warn
 
 from adapta.util import int_, round_, use_settings
@@ -6,92 +8,271 @@ from adapta.util import int_, round_, use_settings
 
 @use_settings
 class Buffer:
-    """Class representing a one-dimensional buffer data structure with an index
-    for reading and an index for writing. Values are stored and returned in a
-    first-in, first-out fashion.
+    """Class representing a one-dimensional ring buffer with a single producer
+    and a single consumer, which may run in different threads without
+    locking. Values are stored and returned in a first-in, first-out fashion.
+    Space following the stored values can be reserved to be written in place,
+    and is stored once it is committed. Stored values can be read in place
+    and are removed once they are released.
 
-    Parameters
-    ----------
-    shape : tuple
-        The shape of the buffer.
-    dtype : nump dtype, optional
-        The data type of the buffer values.
+    The producer and the consumer each advance a counter of values that only
+    they assign, which the interpreter assigns atomically. Values are written
+    before the counter publishing them is advanced, and space is only reused
+    once the consumer has released it. The start of the buffer is mirrored
+    behind its end, so that reads wrapping around the end are contiguous.
+
+    The capacity is given as a duration of audio and can be changed by the
+    producer at any time within a memory budget shared by all buffers. The
+    values are then moved to new storage, which is published at once, and
+    the storage the consumer still reads from stays valid.
 
     """
 
     """ Settings """
+    # audio sample rate in Hz
+    sample_rate = int
+    # number of audio channels
+    num_channels = int
     # audio bit width in bit
     bit_width = int
-    # buffer capacity in MB
-    size = int
+    # initial and minimum capacity in seconds
+    length = float
+    # maximum memory of all buffers in MB
+    budget = int
+    # number of values up to which reads wrapping around are contiguous
+    mirror = int
     # output warnings
     warnings = bool
 
+    # number of bytes allocated by all buffers
+    _allocated = 0
+    _allocation_lock = threading.Lock()
+
     def __init__(self):
-        size = self.size * 1024 ** 2 * 8
-        shape = round_(size / self.bit_width)
-        dtype = int_(self.bit_width)
+        self._dtype = int_(self.bit_width)
+
+        # total numbers of values released by the consumer, committed by the
+        # producer and reserved by the producer
+        self._read = 0
+        self._written = 0
+        self._end = 0
+        # total number of values read by the consumer and not released yet
+        self._acquired = 0
+        # positions of the reservations that are not committed yet
+        self._reservations = deque()
+        # storage of the managed space followed by the mirrored values,
+        # number of managed values and number of mirrored values
+        self._ring = (np.empty(0, dtype=self._dtype), 0, 0)
+        self._minimum = round_(self.length * self.sample_rate) \
+            * self.num_channels
+        if not self.resize(self._minimum):
+            raise ValueError('buffer capacity exceeds the memory budget')
 
-        self._index = 0
-        self._filled = 0
-        # initialize managed space
-        self._buffer = np.empty(shape, dtype=dtype)
+    def __del__(self):
+        with Buffer._allocation_lock:
+            Buffer._allocated -= self._ring[0].nbytes
 
     @property
     def capacity(self):
         """Number of values the buffer can store."""
-        return self._buffer.shape[0]
+        return self._ring[1]
 
     @property
     def filled(self):
         """Number of values stored in the buffer."""
-        return self._filled
+        return max(self._written - self._read, 0)
+
+    @property
+    def released(self):
+        """Total number of values released by the consumer."""
+        return self._read
+
+    @property
+    def written(self):
+        """Total number of values stored by the producer."""
+        return self._written
+
+    @property
+    def reserved(self):
+        """Number of values reserved but not stored yet."""
+        return self._end - self._written
 
     @property
     def free(self):
-        """Number of values that can be stored until the buffer is full."""
-        return self.capacity - self._filled
+        """Number of values that can be stored or reserved until the buffer is
+        full.
+
+        """
+
+        return self.capacity - (self._end - self._read)
+
+    # producer methods
+
+    def resize(self, capacity):
+        """Changes the capacity of the buffer. The stored values and the
+        reservations are moved to new storage.
+
+        Parameters
+        ----------
+        capacity : int
+            The number of values the buffer can store.
+
+        Returns
+        -------
+        bool
+            False iff the stored and reserved values do not fit or the memory
+            budget would be exceeded.
+
+        """
+
+        if capacity < self._end - self._read:
+            return False
+        mirror = min(self.mirror, capacity)
+        num_bytes = (capacity + mirror) * self._dtype.itemsize
+        old = self._ring
+        with Buffer._allocation_lock:
+            allocated = Buffer._allocated - old[0].nbytes + num_bytes
+            if allocated > self.budget * 1024 ** 2:
+                return False
+            Buffer._allocated = allocated
+        ring = (np.empty(capacity + mirror, dtype=self._dtype), capacity,
+                mirror)
+
+        # move the reservations, which may be written meanwhile
+        for position, reservation in self._reservations:
+            reservation.move(self._views(ring, position, reservation.size))
+        # copy the stored values the consumer may still read
+        read = self._read
+        _copy(self._views(old, read, self._written - read),
+              self._views(ring, read, self._written - read))
+        self._update_mirror(ring, read, self._written - read)
+        # the consumer loads the storage after the number of stored values
+        self._ring = ring
+        return True
+
+    def grow(self, num_values):
+        """Grows the buffer if necessary, such that the given number of values
+        can be stored or reserved. The capacity is at least doubled, so that
+        the buffer is rarely resized.
+
+        Returns
+        -------
+        bool
+            False iff the memory budget does not allow the values to fit.
+
+        """
+
+        needed = self._end - self._read + num_values
+        if needed <= self.capacity:
+            return True
+        return self.resize(max(needed, 2 * self.capacity)) or \
+            self.resize(needed)
+
+    def shrink(self):
+        """Halves the capacity of a grown buffer while at most a quarter of it
+        is used, but not below the initial capacity.
+
+        """
+
+        capacity = max(self.capacity // 2, self._minimum)
+        if (capacity < self.capacity
+                and 4 * (self._end - self._read) <= self.capacity):
+            self.resize(capacity)
 
     def clear(self):
-        """Clears the buffer."""
-        self._filled = 0
+        """Clears the buffer and its reservations."""
+        self.truncate(0)
 
-    def pop(self, num_values):
-        """Reads and removes a number of values from the buffer.
+    def truncate(self, num_values):
+        """Removes the most recently stored values, such that at most the
+        given number of values remains in the buffer. The reservations are
+        removed as well. Values the consumer is reading are kept.
+
+        """
+
+        self.rewind(self._read + max(num_values, 0))
+
+    def rewind(self, position):
+        """Removes the values stored after the given total number of stored
+        values, regardless of how far the consumer has read meanwhile. The
+        reservations are removed as well. Values the consumer is reading are
+        kept.
+
+        Parameters
+        ----------
+        position : int
+            The total number of stored values to go back to.
+
+        """
+
+        written = self._written
+        target = max(min(written, position), self._read)
+        self._written = target
+        self._end = target
+        self._reservations.clear()
+        # either the consumer sees the truncation before it reads or the
+        # values it reads are kept
+        acquired = self._acquired
+        if acquired > target:
+            self._written = self._end = min(acquired, written)
+
+    def truncate_reserved(self, num_values):
+        """Removes the most recent reservations, such that at most the given
+        number of values remains reserved. Reservations need to be revoked
+        before their space is removed.
+
+        """
+
+        self._end = self._written + max(min(self.reserved, num_values), 0)
+        while (len(self._reservations) > 0
+               and self._reservations[-1][0] >= self._end):
+            self._reservations.pop()
+
+    def reserve(self, num_values):
+        """Reserves space following the stored and reserved values.
 
         Parameters
         ----------
         num_values : int
-            The number of values to pop.
+            The number of values to reserve.
+
+        Raises
+        ------
+        ValueError
+            Raised if there is not enough free space.
 
         Returns
         -------
-        numpy array
-            An array representing the popped values.
+        :class:`Reservation`
+            The reserved space, which can be written from any thread.
 
         """
 
-        # pop as much as possible
-        if num_values > self.filled:
-            if self.warnings:
-                warn('more requested values than available buffer values')
-            num_values = self.filled
-        # calculate new index
-        next_index = self._index + num_values
-        if next_index >= self.capacity:
-            # new index needs to be adjusted to the beginning of the buffer
-            next_index -= self.capacity
-            # implicit copy
-            result = np.concatenate(
-                (self._buffer[self._index:], self._buffer[:next_index]))
-        else:
-            # explicit copy
-            result = self._buffer[self._index:next_index].copy()
-        # update indexes
-        self._index = next_index
-        self._filled -= num_values
+        if num_values > self.free:
+            raise ValueError('more values to reserve than free buffer space')
+        position = self._end
+        self._end += num_values
+        reservation = Reservation(
+            self._views(self._ring, position, num_values))
+        self._reservations.append((position, reservation))
+        return reservation
 
-        return result
+    def commit(self, num_values):
+        """Stores the oldest reserved values, which need to be written.
+
+        Parameters
+        ----------
+        num_values : int
+            The number of reserved values to store.
+
+        """
+
+        num_values = min(num_values, self.reserved)
+        self._update_mirror(self._ring, self._written, num_values)
+        self._written += num_values
+        while (len(self._reservations) > 0
+               and self._reservations[0][0] < self._written):
+            self._reservations.popleft()
 
     def put(self, array):
         """Filles the buffer with new values.
@@ -108,31 +289,208 @@ class Buffer:
 
         """
 
+        if self.reserved > 0:
+            raise ValueError('values cannot be put while space is reserved')
         num_values = array.shape[0]
-        if num_values > self.free:
+        free = self.free
+        if num_values > free:
             # fill as much as possible
             # store values that could not be stored
             if self.warnings:
                 warn('more new values than free buffer space')
-            result = array[self.free:]
-            array = array[:self.free]
-            num_values = self.free
+            result = array[free:]
+            array = array[:free]
+            num_values = free
         else:
             result = np.array([], dtype=array.dtype)
-        # calculate indexes
-        index = (self._index + self.filled) % self.capacity
-        next_index = index + num_values
-        if next_index >= self.capacity:
-            # new index needs to be adjusted to beginning of buffer
-            next_index -= self.capacity
-            split_at = num_values - next_index
-            # implicit copy
-            self._buffer[index:] = array[:split_at]
-            self._buffer[:next_index] = array[split_at:]
+        Reservation(self._views(self._ring, self._written,
+                                num_values)).write(array)
+        self._update_mirror(self._ring, self._written, num_values)
+        self._written += num_values
+        self._end = self._written
+
+        return result
+
+    # consumer methods
+
+    def read(self, num_values):
+        """Reads the oldest stored values in place. The values stay valid
+        until they are released.
+
+        Parameters
+        ----------
+        num_values : int
+            The number of values to read. Fewer values are read if not enough
+            values are stored.
+
+        Returns
+        -------
+        tuple
+            Views of the values in order, which is a single view unless the
+            values wrap around the end of the buffer beyond the mirrored
+            values.
+
+        """
+
+        read = self._read
+        # announce the read before checking the stored values
+        self._acquired = read + num_values
+        num_values = max(min(num_values, self._written - read), 0)
+        self._acquired = read + num_values
+        ring = self._ring
+        return self._views(ring, read, num_values, ring[2])
+
+    def release(self, num_values):
+        """Removes the oldest read values from the buffer.
+
+        Parameters
+        ----------
+        num_values : int
+            The number of values to remove.
+
+        """
+
+        self._read = min(self._read + num_values, self._acquired)
+
+    def pop(self, num_values):
+        """Reads and removes a number of values from the buffer.
+
+        Parameters
+        ----------
+        num_values : int
+            The number of values to pop.
+
+        Returns
+        -------
+        numpy array
+            An array representing the popped values.
+
+        """
+
+        # pop as much as possible
+        if num_values > self.filled and self.warnings:
+            warn('more requested values than available buffer values')
+        views = self.read(num_values)
+        if len(views) == 1:
+            result = views[0].copy()
         else:
-            # implicit copy
-            self._buffer[index:next_index] = array
-        # update index
-        self._filled += num_values
+            result = np.concatenate(views)
+        self.release(result.shape[0])
 
         return result
+
+    @staticmethod
+    def _views(ring, position, num_values, mirror=0):
+        """Views of the values of a storage following a total position, where
+        values wrapping around the end of the buffer up to the given number
+        are taken from the mirror.
+
+        """
+
+        storage, capacity, _ = ring
+        if capacity == 0:
+            return (storage[:0], )
+        index = position % capacity
+        next_index = index + num_values
+        if next_index <= capacity + mirror:
+            return (storage[index:next_index], )
+        return (storage[index:capacity], storage[:next_index - capacity])
+
+    @staticmethod
+    def _update_mirror(ring, position, num_values):
+        """Copies values of a storage following a total position that are
+        stored at the start of the buffer to the mirror.
+
+        """
+
+        storage, capacity, mirror = ring
+        if capacity == 0:
+            return
+        index = position % capacity
+        for start in (index, index - capacity):
+            stop = min(start + num_values, mirror)
+            if max(start, 0) < stop:
+                storage[capacity + max(start, 0):capacity + stop] = \
+                    storage[max(start, 0):stop]
+
+
+def _copy(sources, targets):
+    """Copies values between two sequences of views of equal total size."""
+    values = sources[0] if len(sources) == 1 else np.concatenate(sources)
+    start = 0
+    for target in targets:
+        target[:] = values[start:start + target.shape[0]]
+        start += target.shape[0]
+
+
+class Reservation:
+    """Class representing reserved buffer space, given as one view or two
+    views if the space wraps around the end of the buffer. The owner of the
+    buffer revokes the reservation before the space is used otherwise, which
+    waits for a write in progress.
+
+    Parameters
+    ----------
+    views : tuple
+        The views of the reserved space in order.
+
+    """
+
+    def __init__(self, views):
+        self._views = views
+        self._lock = threading.Lock()
+        self._revoked = False
+
+    @property
+    def size(self):
+        """Number of reserved values."""
+        return sum(view.shape[0] for view in self._views)
+
+    def write(self, samples):
+        """Writes values into the reserved space. Can be called from any
+        thread.
+
+        Parameters
+        ----------
+        samples : numpy array
+            The values to write, which are converted to the data type of the
+            buffer like 'astype' would. Missing values are filled with zeros,
+            surplus values are dropped.
+
+        Returns
+        -------
+        bool
+            False iff the reservation has been revoked.
+
+        """
+
+        with self._lock:
+            if self._revoked:
+                return False
+            start = 0
+            for view in self._views:
+                values = samples[start:start + view.shape[0]]
+                np.copyto(view[:values.shape[0]], values, casting='unsafe')
+                view[values.shape[0]:] = 0
+                start += view.shape[0]
+            return True
+
+    def revoke(self):
+        """Prevents further writes to the reserved space."""
+        with self._lock:
+            self._revoked = True
+
+    def move(self, views):
+        """Moves the reservation to other space of the same size, along with
+        the values written so far.
+
+        Parameters
+        ----------
+        views : tuple
+            The views of the new space in order.
+
+        """
+
+        with self._lock:
+            _copy(self._views, views)
+            self._views = views
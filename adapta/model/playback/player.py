@@ -1,6 +1,7 @@
 import enum
 import numpy as np
 from pyqtgraph.Qt import QtCore
+from warnings import warn
 
 from adapta.model.playback import Buffer
 from adapta.util import round_, singleton, use_settings, Threadable
@@ -9,8 +10,7 @@ from adapta.util import round_, singleton, use_settings, Threadable
 class State(enum.Enum):
     blocking = 0
     scheduled = 1
-    ignoring = 2
-    awaiting = 3
+    awaiting = 2
 
 
 @singleton
@@ -30,9 +30,15 @@ class Player(Threadable):
     jump_to = str
     # playback position update frequency in Hz
     update_freq = int
+    # duration of audio requested ahead of playback in seconds
+    look_ahead = float
+    # let the output unit pull samples from the buffer instead of sending
+    # them chunk by chunk
+    use_callback = bool
 
     """ Signals """
-    sig_request = QtCore.Signal(int)
+    sig_request = QtCore.Signal(int, int, object)
+    sig_cancel = QtCore.Signal()
     sig_play = QtCore.Signal(object)
     sig_state = QtCore.Signal(object)
     sig_position = QtCore.Signal(object)
@@ -40,9 +46,19 @@ class Player(Threadable):
     def __init__(self):
         super().__init__()
         self._buffer = Buffer()
+        # index of the next segment to request and to store in the buffer
         self._index = 0
-        self._position = 0
-        self._instate = State.blocking
+        self._next = 0
+        # requested segments with their generation and reservation
+        self._requests = {}
+        # numbers of values of the segments written into their reservations
+        # that wait for preceding segments
+        self._received = {}
+        # incremented whenever pending requests become obsolete
+        self._generation = 0
+        # mix sample index of the first buffered value times the number of
+        # channels, minus the total number of values stored before it
+        self._origin = 0
         self._outstate = State.blocking
 
     @property
@@ -52,8 +68,21 @@ class Player(Threadable):
 
     @property
     def position(self):
-        """Playback position."""
-        return self._position
+        """Playback position, following the values the output unit has
+        released from the buffer.
+
+        """
+
+        return (self._buffer.released + self._origin) // self.num_channels
+
+    @property
+    def buffer(self):
+        """Buffer of samples to play back, which the output unit reads from
+        in callback mode.
+
+        """
+
+        return self._buffer
 
     @property
     def playing(self):
@@ -76,58 +105,117 @@ class Player(Threadable):
 
     def _play(self):
         """Start playback."""
-        if self._buffer.filled >= self.samples_per_chunk:
+        if self.use_callback:
+            # the output unit pulls samples as long as the player is playing
+            self._outstate = State.awaiting
+        elif self._buffer.filled >= self.samples_per_chunk:
             self._send()
         else:
             self._outstate = State.scheduled
 
     def send_samples(self):
-        """Send samples to output unit."""
-        if self._outstate == State.awaiting:
+        """Send samples to output unit. In callback mode, the samples pulled
+        by the output unit are accounted for instead.
+
+        """
+
+        if self.use_callback:
+            self._emit_position()
+            self._request()
+        elif self._outstate == State.awaiting:
             self._outstate = State.blocking
             self._send()
 
     def _send(self):
         """Send samples to play back."""
+        if self._outstate == State.blocking and self._buffer.filled == 0:
+            # wait for the mix to provide more samples
+            self._outstate = State.scheduled
+            self._request()
         if (self._outstate == State.blocking):
             self._outstate = State.awaiting
             samples = self._buffer.pop(self.samples_per_chunk)
             self.sig_play.emit(samples)
-            self._position += samples.size // self.num_channels
             self._emit_position()
             self._request()
 
     def _request(self):
-        """Request next mix segment to be computed."""
+        """Request mix segments to be computed until enough audio is pending
+        ahead of playback. Buffer space is reserved for each segment, which
+        the mix writes the samples into. The buffer grows if a segment does
+        not fit and shrinks once the space is not needed anymore.
+
+        """
+
         self._mix.lock()
-        if (self._instate == State.blocking and
-                self._index < self._mix.num_segments):
-            num_samples = self._mix.num_samples(
+        self._buffer.shrink()
+        look_ahead = self.look_ahead * self.sample_rate * self.num_channels
+        pending = self._buffer.filled + self._buffer.reserved
+        while self._index < self._mix.num_segments:
+            num_values = self._mix.num_samples(
                 self._index) * self.num_channels
-            if num_samples <= self._buffer.free:
-                self._instate = State.awaiting
-                self.sig_request.emit(self._index)
-                self._index += 1
+            if pending > 0 and pending >= look_ahead:
+                break
+            if not self._buffer.grow(num_values):
+                if pending == 0:
+                    warn('segment {} exceeds the memory budget of the '
+                         'buffer'.format(self._index))
+                break
+            reservation = self._buffer.reserve(num_values)
+            self._requests[self._index] = (self._generation, reservation)
+            self.sig_request.emit(self._index, self._generation, reservation)
+            self._index += 1
+            pending += num_values
         self._mix.unlock()
 
-    def receive(self, data):
-        """Receive computed mix samples."""
-        if self._instate == State.awaiting:
-            self._buffer.put(data.ravel())
-            if self._outstate == State.scheduled:
-                self._outstate = State.blocking
-                self._play()
-        self._instate = State.blocking
+    def receive(self, index, generation):
+        """Receive the notification that mix samples have been written into
+        their reservation. Segments are committed to the buffer in order,
+        notifications of obsolete requests are dropped.
+
+        """
+
+        request = self._requests.get(index)
+        if request is None or request[0] != generation:
+            return
+        del self._requests[index]
+        self._received[index] = request[1].size
+        while self._next in self._received:
+            self._buffer.commit(self._received.pop(self._next))
+            self._next += 1
+        if self._outstate == State.scheduled:
+            self._outstate = State.blocking
+            self._play()
         self._request()
 
+    def _discard(self, index):
+        """Discard requested and received segments from a segment on, and
+        free their reserved buffer space.
+
+        """
+
+        self._generation += 1
+        for key in [key for key in self._requests if key >= index]:
+            # the mix must not write into the space once it is reused
+            self._requests.pop(key)[1].revoke()
+        for key in [key for key in self._received if key >= index]:
+            del self._received[key]
+        self._index = index
+        self._next = min(self._next, index)
+        kept = sum(request[1].size for request in self._requests.values())
+        self._buffer.truncate_reserved(kept + sum(self._received.values()))
+
     def _reset(self, index):
         """Reset computed samples and move to specific playback position."""
         self._mix.lock()
+        self._discard(0)
         self._index = index
-        self._position = self._mix.sample_indeces[index]
+        self._next = index
+        self.sig_cancel.emit()
         self._buffer.clear()
-        if self._instate == State.awaiting:
-            self._instate = State.ignoring
+        # values the output unit is reading are kept in front of the segment
+        self._origin = (self._mix.sample_indeces[index] * self.num_channels
+                        - self._buffer.written)
         if self._outstate == State.awaiting:
             self._outstate = State.scheduled
         self._emit_position()
@@ -135,6 +223,54 @@ class Player(Threadable):
         self._request()
         self._mix.unlock()
 
+    def invalidate(self, start, stop):
+        """Discard computed samples of segments that have changed.
+
+        Parameters
+        ----------
+        start : int
+            The index of the first changed segment.
+        stop : int
+            The index of the segment after the last changed segment.
+
+        """
+
+        self._mix.lock()
+        # the segment currently played back is not recomputed
+        current = np.searchsorted(
+            self._mix.sample_indeces, self.position, 'right') - 1
+        index = max(start, current + 1)
+        if index < min(stop, self._index):
+            if index < self._next:
+                # cut the buffer where the segment starts, even if the output
+                # unit has read further meanwhile
+                sample_index = self._mix.sample_indeces[index]
+                self._buffer.rewind(
+                    sample_index * self.num_channels - self._origin)
+                self._origin = (sample_index * self.num_channels
+                                - self._buffer.written)
+            self._discard(index)
+            self._request()
+        self._mix.unlock()
+
+    def refresh(self, mix, start, stop):
+        """Handle changed beat positions of the mix.
+
+        Parameters
+        ----------
+        mix : :class:`Mix`
+            The updated mix.
+        start : int
+            The index of the first segment whose position has changed.
+        stop : int
+            The index of the segment after the last changed segment.
+
+        """
+
+        if start < stop:
+            self.invalidate(start, stop)
+        self._request()
+
     def stop(self):
         """Stop playback and reset to start of mix."""
         self._outstate = State.blocking
@@ -159,7 +295,7 @@ class Player(Threadable):
         """Jump to start of next track."""
         self._mix.lock()
         index = np.searchsorted(self._mix.sample_indeces,
-                                self._position, 'right') - 1
+                                self.position, 'right') - 1
         positions = sorted(
             set(map(lambda track: track.position, self._mix.tracks.values())))
         index = np.searchsorted(positions, index, 'right')
@@ -172,7 +308,7 @@ class Player(Threadable):
         """Jump to start of nearest previous track."""
         self._mix.lock()
         index = np.searchsorted(self._mix.sample_indeces,
-                                self._position, 'right') - 1
+                                self.position, 'right') - 1
         positions = sorted(
             set(map(lambda track: track.position, self._mix.tracks.values())))
         index = np.searchsorted(positions, index) - 1
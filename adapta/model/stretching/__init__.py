@@ -0,0 +1,3 @@
+from adapta.model.stretching.stretcher import Stretcher, real_time_factor
+from adapta.model.stretching.resampler import Resampler
+from adapta.model.stretching.wsola import Wsola
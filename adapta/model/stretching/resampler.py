@@ -0,0 +1,134 @@
+import numpy as np
+
+from adapta.model.stretching import Stretcher
+from adapta.util import use_settings
+
+
+@use_settings
+class Resampler(Stretcher):
+    """Class stretching audio by band-limited resampling, which changes the
+    pitch along with the tempo. Output samples are interpolated with a
+    Kaiser-windowed sinc filter, whose coefficients are tabulated for a
+    number of fractional phases and linearly interpolated in between. The
+    fractional input position of the next output sample is carried over
+    between calls.
+
+    """
+
+    """ Settings """
+    # number of zero crossings of the sinc filter on each side
+    num_zeros = int
+
+    # number of tabulated fractional phases
+    num_phases = 512
+    # shape parameter of the kaiser window
+    beta = 8.6
+    # precision of the ratios the filter banks are computed for
+    precision = 1e-3
+    # maximum number of cached filter banks
+    cache_size = 64
+    # largest input step per output sample whose filter context is kept
+    # even while no filter is needed
+    context_step = 2.0
+
+    # filter banks by number of zero crossings and cutoff frequency
+    _banks = {}
+
+    def __init__(self, sample_rate, num_channels, dtype):
+        # number of input samples ever needed as context, such that segments
+        # taken over unchanged keep the context of the following ones
+        self._history = self.half_length(self.context_step)
+        super().__init__(sample_rate, num_channels, dtype)
+
+    def bank(self, step):
+        """Filter bank for resampling with the given input step per output
+        sample. When downsampling, the cutoff frequency is lowered to avoid
+        aliasing and the filter gets longer accordingly.
+
+        Parameters
+        ----------
+        step : float
+            The number of input samples per output sample.
+
+        Returns
+        -------
+        numpy array
+            The filter coefficients for each tabulated phase, including the
+            phase of a whole sample.
+
+        """
+
+        cutoff = self.cutoff(step)
+        key = (self.num_zeros, cutoff, self._dtype)
+        if key not in self._banks:
+            half = self.half_length(step)
+            # distances of the taps from the output position for each phase
+            phases = np.arange(self.num_phases + 1) / self.num_phases
+            distances = (np.arange(2 * half) - half + 1
+                         - phases[:, np.newaxis])
+            # kaiser window reaching zero just outside the outermost taps
+            ratios = np.clip(distances / (half + 1), -1, 1)
+            window = (np.i0(self.beta * np.sqrt(1 - ratios ** 2))
+                      / np.i0(self.beta))
+            bank = cutoff * np.sinc(cutoff * distances) * window
+            if len(self._banks) >= self.cache_size:
+                self._banks.clear()
+            self._banks[key] = bank.astype(self._dtype)
+        return self._banks[key]
+
+    def cutoff(self, step):
+        """Cutoff frequency of the filter relative to the input Nyquist
+        frequency.
+
+        """
+
+        if step <= 1:
+            return 1.0
+        return round(1 / step / self.precision) * self.precision
+
+    def half_length(self, step):
+        """Number of filter taps on each side of an output sample."""
+        return int(np.ceil(self.num_zeros / self.cutoff(step)))
+
+    @property
+    def history(self):
+        return self._history
+
+    def lookahead(self, num_input, num_output):
+        if num_output == 0:
+            return 0
+        return self.half_length(num_input / num_output)
+
+    def _process(self, num_input, num_output):
+        step = num_input / num_output
+        positions = self._position + np.arange(num_output) * step
+        indices = np.floor(positions).astype(int)
+        if step == 1 and positions[0] == indices[0]:
+            # the samples are taken over unchanged
+            return self._buffer[indices[0]:indices[0] + num_output].copy()
+
+        bank = self.bank(step)
+        half = bank.shape[1] // 2
+        self._history = max(self._history, half)
+        # context missing before the first input samples is silent
+        padding = max(half - 1 - indices[0], 0)
+        buffer = self._buffer
+        if padding > 0:
+            shape = (padding, ) + buffer.shape[1:]
+            buffer = np.concatenate((np.zeros(shape, buffer.dtype), buffer))
+        indices += padding - half + 1
+
+        # interpolate the coefficients between the tabulated phases
+        phases = (positions - np.floor(positions)) * self.num_phases
+        lower = phases.astype(int)
+        weights = (phases - lower).astype(self._dtype)[:, np.newaxis]
+        coefficients = bank[lower] * (1 - weights)
+        coefficients += bank[lower + 1] * weights
+
+        # weight the windows of input samples around each output sample
+        windows = np.lib.stride_tricks.as_strided(
+            buffer,
+            (buffer.shape[0] - 2 * half + 1, 2 * half) + buffer.shape[1:],
+            (buffer.strides[0], ) + buffer.strides,
+            writeable=False)
+        return np.einsum('nt...,nt->n...', windows[indices], coefficients)
@@ -0,0 +1,203 @@
+import numpy as np
+import time
+
+
+class Stretcher:
+    """Abstract base class for streaming time stretching. Input samples are
+    fed in order, and each call of :meth:`process` maps the following input
+    samples onto a requested number of output samples. The state is carried
+    over between calls, such that consecutive calls process one continuous
+    signal without discontinuities at their boundaries.
+
+    Parameters
+    ----------
+    sample_rate : int
+        The sample rate of the audio in Hz.
+    num_channels : int
+        The number of channels of the audio.
+    dtype : numpy dtype
+        The data type of the audio.
+
+    """
+
+    def __init__(self, sample_rate, num_channels, dtype):
+        self._sample_rate = sample_rate
+        self._shape = () if num_channels == 1 else (num_channels, )
+        self._dtype = np.dtype(dtype)
+        # number of seconds produced and time spent producing them
+        self._produced = 0.0
+        self._elapsed = 0.0
+        self.reset()
+
+    def reset(self, history=None):
+        """Discards all input, for example to continue at another position.
+
+        Parameters
+        ----------
+        history : numpy array, optional
+            The input samples preceding the next fed samples. They are used
+            as context only and are not processed again.
+
+        """
+
+        self._buffer = np.zeros((0, ) + self._shape, dtype=self._dtype)
+        # input position of the next output sample relative to the buffer
+        self._position = 0.0
+        self._finished = False
+        if history is not None:
+            self.feed(history)
+            self._position = float(self._buffer.shape[0])
+
+    def feed(self, samples):
+        """Appends input samples.
+
+        Parameters
+        ----------
+        samples : numpy array
+            The input samples.
+
+        """
+
+        samples = np.asarray(samples, dtype=self._dtype)
+        self._buffer = np.concatenate(
+            (self._buffer, samples.reshape((-1, ) + self._shape)))
+
+    def finish(self):
+        """Marks the end of the input. Missing context at the end is assumed
+        to be silent.
+
+        """
+
+        self._finished = True
+
+    @property
+    def available(self):
+        """Number of fed input samples that are not processed yet."""
+        return self._buffer.shape[0] - int(np.floor(self._position))
+
+    def ready(self, num_input, num_output):
+        """Checks if enough input is available for a call of :meth:`process`.
+
+        """
+
+        return (self._finished or self.available >=
+                num_input + self.lookahead(num_input, num_output))
+
+    def process(self, num_input, num_output):
+        """Stretches the following input samples.
+
+        Parameters
+        ----------
+        num_input : int
+            The number of input samples to stretch.
+        num_output : int
+            The number of output samples to produce.
+
+        Raises
+        ------
+        ValueError
+            Raised if not enough input has been fed.
+
+        Returns
+        -------
+        numpy array
+            The output samples.
+
+        """
+
+        if not self.ready(num_input, num_output):
+            raise ValueError('not enough input to process')
+        begin = time.perf_counter()
+        missing = (num_input + self.lookahead(num_input, num_output)
+                   - self.available)
+        if missing > 0:
+            self.feed(np.zeros((missing, ) + self._shape, self._dtype))
+        if num_output > 0:
+            result = self._process(num_input, num_output)
+        else:
+            result = np.zeros((0, ) + self._shape, dtype=self._dtype)
+        self._position += num_input
+
+        # drop input that is not needed as context anymore
+        drop = int(np.floor(self._position)) - self.history
+        if drop > 0:
+            self._buffer = self._buffer[drop:]
+            self._position -= drop
+        self._produced += num_output / self._sample_rate
+        self._elapsed += time.perf_counter() - begin
+        return result
+
+    @property
+    def real_time_factor(self):
+        """Duration of the produced audio divided by the time spent producing
+        it, or 'None' if nothing has been produced.
+
+        """
+
+        if self._elapsed == 0:
+            return None
+        return self._produced / self._elapsed
+
+    # overwrite methods
+
+    @property
+    def history(self):
+        """Number of processed input samples kept as context."""
+        return 0
+
+    def lookahead(self, num_input, num_output):
+        """Number of input samples following the processed ones that are
+        needed as context.
+
+        """
+
+        return 0
+
+    def _process(self, num_input, num_output):
+        """Computes the output samples. The input samples start at the
+        current position in the buffer, which holds enough context on both
+        sides.
+
+        """
+
+        raise NotImplementedError
+
+
+def real_time_factor(stretcher, audio, ratio, segment_length=0.5):
+    """Measures the throughput of a stretcher.
+
+    Parameters
+    ----------
+    stretcher : :class:`Stretcher`
+        The stretcher.
+    audio : :class:`Audio`
+        The audio to stretch.
+    ratio : float
+        The ratio of output to input length.
+    segment_length : float, optional
+        The length of the input segments passed at once in seconds.
+
+    Returns
+    -------
+    float
+        The duration of the stretched audio divided by the processing time.
+
+    """
+
+    stretcher.reset()
+    step = int(round(segment_length * audio.sample_rate))
+    begin = time.perf_counter()
+    fed = 0
+    num_samples = 0
+    for start in range(0, audio.shape[0], step):
+        num_input = min(step, audio.shape[0] - start)
+        num_output = int(round(num_input * ratio))
+        # feed the input segments in order until enough context is known
+        while not stretcher.ready(num_input, num_output):
+            if fed < audio.shape[0]:
+                stretcher.feed(audio[fed:fed + step])
+                fed += step
+            else:
+                stretcher.finish()
+        num_samples += stretcher.process(num_input, num_output).shape[0]
+    return num_samples / audio.sample_rate / (time.perf_counter() - begin)
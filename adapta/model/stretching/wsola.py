@@ -0,0 +1,119 @@
+import numpy as np
+from scipy import signal
+
+from adapta.model.stretching import Stretcher
+from adapta.util import use_settings
+
+
+@use_settings
+class Wsola(Stretcher):
+    """Class stretching audio while preserving the pitch by waveform
+    similarity overlap-add. Hann windowed frames are added at half overlap.
+    Each frame is read from the input position the output position maps to,
+    shifted within a tolerance such that it best continues the previous
+    frame. All channels are shifted alike to keep the stereo image. The
+    output of frames reaching into the following call is carried over.
+
+    """
+
+    """ Settings """
+    # frame length in seconds
+    frame_length = float
+    # maximum shift of the frames in seconds
+    tolerance = float
+
+    def __init__(self, sample_rate, num_channels, dtype):
+        self._frame_size = 2 * int(round(self.frame_length * sample_rate / 2))
+        self._hop = self._frame_size // 2
+        self._tolerance = int(round(self.tolerance * sample_rate))
+        self._window = np.hanning(self._frame_size + 1)[:-1].astype(dtype)
+        if num_channels > 1:
+            self._window = self._window[:, np.newaxis]
+        super().__init__(sample_rate, num_channels, dtype)
+
+    def reset(self, history=None):
+        super().reset(history)
+        # overlap-added output following the returned samples
+        self._output = np.zeros((2 * self._frame_size, ) + self._shape,
+                                dtype=self._dtype)
+        # output position of the next frame
+        self._frame = 0
+        # input position of the previous frame relative to the position of
+        # the next input sample, or 'None' at the start of the stream
+        self._previous = None
+
+    @property
+    def history(self):
+        return 2 * (self._frame_size + self._tolerance)
+
+    def lookahead(self, num_input, num_output):
+        return self._frame_size + self._hop + self._tolerance + 1
+
+    def shift(self, mono, start, target):
+        """Finds the frame that best continues the previous frame.
+
+        Parameters
+        ----------
+        mono : numpy array
+            The input samples mixed down to one channel.
+        start : int
+            The input position the frame maps to.
+        target : int
+            The input position of the natural continuation of the previous
+            frame.
+
+        Returns
+        -------
+        int
+            The input position of the frame.
+
+        """
+
+        lower = max(start - self._tolerance, 0)
+        upper = min(start + self._tolerance, mono.shape[0] - self._frame_size)
+        if upper <= lower:
+            return start
+        region = mono[lower:upper + self._frame_size]
+        template = mono[target:target + self._frame_size]
+        correlation = signal.correlate(region, template, 'valid', 'fft')
+        # normalize by the energy of each candidate frame
+        energies = np.concatenate(
+            ([0], np.cumsum(np.square(region, dtype=np.float64))))
+        energies = energies[self._frame_size:] - energies[:-self._frame_size]
+        correlation /= np.sqrt(np.maximum(energies, 1e-12))
+        return lower + int(np.argmax(correlation))
+
+    def _process(self, num_input, num_output):
+        step = num_input / num_output
+        size = self._frame_size
+        mono = self._buffer
+        if mono.ndim > 1:
+            mono = mono.sum(axis=1)
+        length = self._frame + num_output + size
+        if self._output.shape[0] < length:
+            padding = np.zeros((length - self._output.shape[0], )
+                               + self._shape, dtype=self._dtype)
+            self._output = np.concatenate((self._output, padding))
+
+        previous = self._previous
+        if previous is not None:
+            previous += int(self._position)
+        while self._frame < num_output:
+            start = int(round(self._position + self._frame * step))
+            if previous is not None:
+                start = self.shift(mono, start, previous + self._hop)
+            frame = self._buffer[start:start + size] * self._window
+            if previous is None:
+                # start the stream without fading in
+                frame[:self._hop] = self._buffer[start:start + self._hop]
+            self._output[self._frame:self._frame + size] += frame
+            previous = start
+            self._frame += self._hop
+        if previous is not None:
+            self._previous = previous - int(self._position) - num_input
+
+        result = self._output[:num_output].copy()
+        self._output = np.roll(self._output, -num_output, axis=0)
+        self._output[-num_output:] = 0
+        self._frame -= num_output
+        return result
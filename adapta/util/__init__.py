@@ -1,6 +1,8 @@
 from adapta.util.functions import (
-    int_, round_, intmax, db_to_ratio, bpm_to_time, time_to_bpm, isarray,
-    expspace, seconds_to_time, time_to_seconds, load_beats)
-from adapta.util.settings import load, use_settings
+    int_, float_, round_, intmax, db_to_ratio, bpm_to_time, time_to_bpm,
+    isarray, linspace, geomspace, expspace, expinterp, seconds_to_time,
+    time_to_seconds, load_beats, hash_file)
+from adapta.util.cache import Cache
+from adapta.util.settings import dump, load, use_settings
 from adapta.util.singleton import singleton
 from adapta.util.threadable import Threadable
@@ -0,0 +1,172 @@
+import hashlib
+import numpy as np
+import os
+import tempfile
+
+
+class Cache:
+    """Base class for persistent caches storing each entry as a single file in
+    a cache directory. Whenever the total size of all entries exceeds the
+    capacity of the cache, entries are evicted in least recently used order.
+
+    """
+
+    """ Settings """
+    # enable the cache
+    enabled = bool
+    # cache directory
+    directory = str
+    # cache capacity in MB
+    size = int
+
+    # file name extension of cache entries
+    extension = '.npy'
+
+    @property
+    def root(self):
+        """Absolute path to the cache directory."""
+        root = os.path.abspath(os.path.expanduser(self.directory))
+        os.makedirs(root, exist_ok=True)
+        return root
+
+    @property
+    def capacity(self):
+        """Number of bytes the cache can store."""
+        return self.size * 1024 ** 2
+
+    @staticmethod
+    def key(*parts):
+        """Combines the given parts to a key identifying a cache entry.
+
+        Parameters
+        ----------
+        parts
+            The objects the entry depends on. They need to have a unique
+            string representation.
+
+        Returns
+        -------
+        str
+            The key of the entry.
+
+        """
+
+        digest = hashlib.sha1()
+        for part in parts:
+            digest.update(str(part).encode())
+            digest.update(b'\0')
+        return digest.hexdigest()
+
+    def path(self, key):
+        """Path to the file storing the entry with the given key."""
+        return os.path.join(self.root, key + self.extension)
+
+    def entries(self):
+        """Lists all cache entries.
+
+        Returns
+        -------
+        list
+            Tuples of path, size in bytes and time of last access of each
+            entry, starting with the least recently used entry.
+
+        """
+
+        entries = []
+        with os.scandir(self.root) as iterator:
+            for entry in iterator:
+                if entry.is_file() and entry.name.endswith(self.extension):
+                    stat = entry.stat()
+                    entries.append((entry.path, stat.st_size, stat.st_mtime))
+        entries.sort(key=lambda x: x[2])
+        return entries
+
+    def get(self, key):
+        """Fetches the entry with the given key.
+
+        Parameters
+        ----------
+        key : str
+            The key of the entry.
+
+        Returns
+        -------
+        object
+            The cached value, or 'None' if the entry does not exist.
+
+        """
+
+        if not self.enabled:
+            return None
+        path = self.path(key)
+        try:
+            value = self.read(path)
+        except (OSError, ValueError):
+            return None
+        # mark entry as recently used
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return value
+
+    def put(self, key, value):
+        """Stores a new entry and evicts old entries if necessary.
+
+        Parameters
+        ----------
+        key : str
+            The key of the entry.
+        value : object
+            The value to store.
+
+        """
+
+        if not self.enabled:
+            return
+        # write to a temporary file first so that concurrent readers never
+        # see incomplete entries
+        handle, path = tempfile.mkstemp(dir=self.root, suffix='.tmp')
+        try:
+            with os.fdopen(handle, 'wb') as file:
+                self.write(file, value)
+            os.replace(path, self.path(key))
+        except BaseException:
+            os.remove(path)
+            raise
+        self.evict()
+
+    def evict(self):
+        """Removes least recently used entries until the cache does not exceed
+        its capacity anymore.
+
+        """
+
+        entries = self.entries()
+        total = sum(size for _, size, _ in entries)
+        for path, size, _ in entries:
+            if total <= self.capacity:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+
+    def clear(self):
+        """Removes all entries."""
+        for path, _, _ in self.entries():
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    # optional overwrite methods
+
+    def read(self, path):
+        """Reads the value stored in the given file."""
+        return np.load(path)
+
+    def write(self, file, value):
+        """Writes a value to the given file handle."""
+        np.save(file, value)
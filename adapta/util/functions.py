@@ -1,4 +1,7 @@
+import functools
+import hashlib
 import numpy as np
+import os
 
 
 def int_(num_bits):
@@ -20,6 +23,25 @@ def int_(num_bits):
     return np.dtype('int{}'.format(num_bits))
 
 
+def float_(num_bits):
+    """Creates the numpy float data type corresponding to the specified
+    number of bits.
+
+    Parameters
+    ----------
+    num_bits : int
+        The number of bits the data type uses.
+
+    Returns
+    -------
+    numpy dtype
+        The numpy float data type.
+
+    """
+
+    return np.dtype('float{}'.format(num_bits))
+
+
 def round_(number):
     """Rounds the given number to an integer and makes sure that the result can
     be used for indexing lists.
@@ -39,25 +61,35 @@ def round_(number):
     return np.round(number).astype(np.int)
 
 
-def intmax(dtype):
+def intmax(dtype, float_dtype=None):
     """Fetches the maximum value the given numpy data type can have.
 
     Parameters
     ----------
     dtype : numpy dtype
         The numpy data type.
+    float_dtype : numpy dtype, optional
+        A float data type the maximum is represented in. The maximum of wide
+        integer types rounds up in narrow float types, in which case the
+        largest smaller value of the float type is returned.
 
     Returns
     -------
-    int
+    int or float
         The maximum value.
 
     """
 
-    return np.iinfo(dtype).max
+    maximum = np.iinfo(dtype).max
+    if float_dtype is None:
+        return maximum
+    result = np.array(maximum, dtype=float_dtype)[()]
+    if result > maximum:
+        result = np.nextafter(result, result.dtype.type(0))
+    return result
 
 
-def db_to_ratio(db):
+def db_to_ratio(db, dtype=None):
     """Converts the volume of an audio track to the ratio its samples need to
     be scaled with.
 
@@ -65,6 +97,9 @@ def db_to_ratio(db):
     ----------
     db : float
         The volumne in decibel.
+    dtype : numpy dtype, optional
+        The data type to compute the ratio in. Per default, the data type of
+        the volume is kept.
 
     Returns
     -------
@@ -73,7 +108,9 @@ def db_to_ratio(db):
 
     """
 
-    return 10 ** (db / 20)
+    if dtype is None:
+        return 10 ** (db / 20)
+    return np.power(10, np.divide(db, 20, dtype=dtype), dtype=dtype)
 
 
 def bpm_to_time(bpm):
@@ -91,17 +128,92 @@ def isarray(x):
     return all(hasattr(x, attr) for attr in ('__len__', '__getitem__'))
 
 
-def expspace(x, y, exp, num):
-    """Similar to np.linspace, exponentially interpolates between values.
+def linspace(x, y, num, dtype=None, start=0, stop=None):
+    """Same as np.linspace without endpoint, but computes only the samples
+    with indeces in the range from start to stop. The samples are identical
+    to the ones of the complete sequence.
+
+    """
+
+    if stop is None:
+        stop = num
+    x = np.asanyarray(x) * 1.0
+    y = np.asanyarray(y) * 1.0
+    dt = np.result_type(x, y, float(num))
+    if dtype is None:
+        dtype = dt
+    deltas = y - x
+    result = np.arange(start, stop, dtype=dt)
+    result = result.reshape((-1,) + (1,) * np.ndim(deltas))
+    if num > 0:
+        steps = deltas / num
+        if np.any(steps == 0):
+            result /= num
+            result = result * deltas
+        else:
+            result = result * steps
+    else:
+        result = result * deltas
+    result += x
+    return result.astype(dtype, copy=False)
+
+
+def geomspace(x, y, num, dtype=None, start=0, stop=None):
+    """Same as np.geomspace without endpoint for positive values, but computes
+    only the samples with indeces in the range from start to stop. The samples
+    are identical to the ones of the complete sequence.
 
     """
 
-    deltas = np.subtract(y, x)
+    if stop is None:
+        stop = num
+    x = np.asanyarray(x)
+    y = np.asanyarray(y)
+    dt = np.result_type(x, y, float(num), np.zeros((), dtype))
+    if dtype is None:
+        dtype = dt
+    x = x.astype(dt)
+    y = y.astype(dt)
+    exponents = linspace(np.log10(x), np.log10(y), num, None, start, stop)
+    result = np.power(10.0, exponents).astype(dtype, copy=False)
+    if start == 0 and stop > 0:
+        result[0] = x
+    return result
+
+
+def expspace(x, y, exp, num, dtype=None, start=0, stop=None):
+    """Similar to np.linspace, exponentially interpolates between values. The
+    range from start to stop selects the samples to compute.
+
+    """
+
+    deltas = np.subtract(y, x, dtype=dtype)
     signs = np.sign(deltas)
-    degrees = np.power(2.0, signs * exp)
-    factors = np.divide(np.geomspace(1, degrees, num, False) - 1, degrees - 1,
-                        where=degrees != 1)
-    return np.add(factors * deltas,  x)
+    degrees = np.power(2, signs * exp, dtype=deltas.dtype)
+    factors = geomspace(1, degrees, num, deltas.dtype, start, stop)
+    factors -= 1
+    np.divide(factors, degrees - 1, out=factors, where=degrees != 1)
+    return np.add(factors * deltas, x, dtype=deltas.dtype)
+
+
+def expinterp(x, y, exp, positions, dtype=None):
+    """Exponentially interpolates between values at arbitrary positions, given
+    as fractions of the distance from x to y. Agrees with :func:`expspace` at
+    the positions of its samples.
+
+    """
+
+    deltas = np.subtract(y, x, dtype=dtype)
+    signs = np.sign(deltas)
+    degrees = np.power(2, signs * exp, dtype=deltas.dtype)
+    positions = np.asarray(positions, dtype=deltas.dtype)
+    if deltas.ndim > 0:
+        positions = positions[:, np.newaxis]
+    factors = np.power(degrees, positions, dtype=deltas.dtype)
+    factors -= 1
+    np.divide(factors, degrees - 1, out=factors,
+              where=np.broadcast_to(degrees != 1, factors.shape))
+    return np.add(factors * deltas, x, dtype=deltas.dtype)
 
 
 def seconds_to_time(seconds, digits=3):
@@ -138,3 +250,33 @@ def load_beats(path):
     """Load beat positions from text file."""
     return np.loadtxt(path, converters={0: time_to_seconds}, usecols=0,
                       encoding='latin1')
+
+
+def hash_file(path):
+    """Computes a digest of the content of a file. Digests are memorized as
+    long as size and modification time of the file do not change.
+
+    Parameters
+    ----------
+    path : str
+        The path to the file.
+
+    Returns
+    -------
+    str
+        The hexadecimal digest.
+
+    """
+
+    stat = os.stat(path)
+    return _hash_file(os.path.abspath(path), stat.st_size, stat.st_mtime_ns)
+
+
+@functools.lru_cache(maxsize=None)
+def _hash_file(path, size, mtime):
+    """Helper function for hash_file."""
+    digest = hashlib.sha1()
+    with open(path, 'rb') as file:
+        for chunk in iter(lambda: file.read(1024 ** 2), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
@@ -1,3 +1,4 @@
+import copy
 import json
 import pkg_resources as pkg
 
@@ -7,11 +8,21 @@ with open(default) as jsonfile:
     _settings = json.load(jsonfile)
 
 
-def load(path):
-    """Load new settings."""
-    with open(path) as jsonfile:
-        for name, value in json.load(jsonfile).items():
-            _settings[name].update(value)
+def load(settings):
+    """Load new settings from a json file or a dictionary."""
+    if isinstance(settings, str):
+        with open(settings) as jsonfile:
+            settings = json.load(jsonfile)
+    for name, value in settings.items():
+        _settings[name].update(value)
+
+
+def dump():
+    """Copy of the current settings, which can be loaded in other processes.
+
+    """
+
+    return copy.deepcopy(_settings)
 
 
 def _getter(name):
@@ -1,11 +1,82 @@
+import numpy as np
 import pyaudio as pa
 from pyqtgraph.Qt import QtCore
+import threading
+import time
+
+from adapta.util import int_, singleton, use_settings, Threadable
+
+
+class NullStream:
+    """Stand-in for an output stream of an audio device, which consumes
+    samples in real time without playing them. Allows playback without sound
+    hardware.
+
+    Parameters
+    ----------
+    rate : int
+        The sample rate in Hz.
+    channels : int
+        The number of channels.
+    format : int
+        The sample format.
+    frames_per_buffer : int
+        The number of frames per period.
+    stream_callback : callable, optional
+        The function called for each period in callback mode.
 
-from adapta.util import singleton, use_settings, Threadable
+    """
+
+    def __init__(self, rate, channels, format, frames_per_buffer,
+                 stream_callback=None, **kwargs):
+        self._rate = rate
+        self._frame_size = channels * pa.get_sample_size(format)
+        self._period = frames_per_buffer
+        self._callback = stream_callback
+        self._active = threading.Event()
+        self._thread = None
+
+    def is_active(self):
+        return self._active.is_set()
+
+    def start_stream(self):
+        if self._active.is_set():
+            return
+        self._active.set()
+        if self._callback is not None:
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+
+    def stop_stream(self):
+        self._active.clear()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def close(self):
+        self.stop_stream()
+
+    def write(self, frames):
+        time.sleep(len(frames) / self._frame_size / self._rate)
+
+    def _run(self):
+        """Calls the callback once per period in real time."""
+        deadline = time.perf_counter()
+        while self._active.is_set():
+            data, flag = self._callback(None, self._period, {}, 0)
+            if len(data) != self._period * self._frame_size:
+                raise ValueError('callback returned a wrong number of bytes')
+            if flag != pa.paContinue:
+                self._active.clear()
+            deadline += self._period / self._rate
+            time.sleep(max(deadline - time.perf_counter(), 0))
 
 
-class Stream_(pa.Stream):
-    """Class providing the output stream for the playback of the mix.
+class Stream_:
+    """Class providing the output stream for the playback of the mix. Samples
+    are either written chunk by chunk, which blocks until they are played, or
+    pulled from the playback buffer in the callback of the audio device,
+    whose period determines the latency.
 
     """
 
@@ -16,30 +87,116 @@ class Stream_(pa.Stream):
     bit_width = int
     # number of output channels
     num_channels = int
+    # pull samples from the playback buffer in the callback of the device
+    use_callback = bool
+    # number of frames per period of the device
+    period_size = int
+    # play into a stand-in device that discards the samples
+    null_device = bool
+    # frequency of requests for more samples in callback mode in Hz
+    update_freq = int
 
     _FORMAT = {8: pa.paInt8, 16: pa.paInt16, 24: pa.paInt24, 32: pa.paInt32}
 
     def __init__(self):
-        self._pyaudio = pa.PyAudio()
-
-        super().__init__(self._pyaudio,
-                         rate=self.sample_rate,
-                         channels=self.num_channels,
-                         format=self._FORMAT[self.bit_width],
-                         output=True)
+        super().__init__()
+        self._buffer = None
+        # number of values read from the buffer in the previous period
+        self._pending = 0
+        # number of frames played since the last request
+        self._played = 0
+        # samples of periods the buffer cannot provide in place
+        self._scratch = np.zeros(self.period_size * self.num_channels,
+                                 dtype=int_(self.bit_width))
+
+        params = dict(rate=self.sample_rate,
+                      channels=self.num_channels,
+                      format=self._FORMAT[self.bit_width],
+                      output=True,
+                      frames_per_buffer=self.period_size)
+        if self.use_callback:
+            params.update(stream_callback=self._callback, start=False)
+        self._pyaudio = None
+        if self.null_device:
+            self._stream = NullStream(**params)
+        else:
+            self._pyaudio = pa.PyAudio()
+            self._stream = self._pyaudio.open(**params)
 
     def __del__(self):
-        self.close()
-        self._pyaudio.terminate()
+        self._stream.close()
+        if self._pyaudio is not None:
+            self._pyaudio.terminate()
+
+    def set_buffer(self, buffer):
+        """Sets the playback buffer the samples are pulled from in callback
+        mode. The stream is its only consumer.
+
+        """
+
+        self._buffer = buffer
 
     def play(self, audio):
         """Start writing to stream."""
-        self.start_stream()
-        self.write(audio.tobytes())
+        self._stream.start_stream()
+        # hand over the samples without copying them to a bytes object
+        self._stream.write(memoryview(audio).cast('B').toreadonly())
 
     def pause(self):
         """Pause writing to stream."""
-        self.stop_stream()
+        self._stream.stop_stream()
+
+    def set_state(self, playing):
+        """Starts or stops pulling samples in callback mode, or pauses
+        writing to the stream otherwise.
+
+        Parameters
+        ----------
+        playing : callable
+            Function returning True iff the player is playing back.
+
+        """
+
+        if self.use_callback and playing():
+            if not self._stream.is_active():
+                self._stream.start_stream()
+            return
+        self.pause()
+        if self._buffer is not None:
+            # the callback is not running anymore
+            self._buffer.release(self._pending)
+            self._pending = 0
+
+    def _callback(self, in_data, frame_count, time_info, status):
+        """Passes the following samples of the playback buffer to the device.
+        The samples are read in place and released in the following period,
+        once the device has copied them. Missing samples are silent.
+
+        """
+
+        self._buffer.release(self._pending)
+        num_values = frame_count * self.num_channels
+        views = self._buffer.read(num_values)
+        if len(views) == 1 and views[0].shape[0] == num_values:
+            data = views[0]
+            self._pending = num_values
+        else:
+            if self._scratch.shape[0] < num_values:
+                self._scratch = np.zeros(num_values, self._scratch.dtype)
+            data = self._scratch[:num_values]
+            start = 0
+            for view in views:
+                data[start:start + view.shape[0]] = view
+                start += view.shape[0]
+            data[start:] = 0
+            self._buffer.release(start)
+            self._pending = 0
+
+        self._played += frame_count
+        if self._played >= self.sample_rate / self.update_freq:
+            self._played = 0
+            self.sig_request.emit()
+        return memoryview(data).cast('B').toreadonly(), pa.paContinue
 
 
 @singleton
@@ -24,6 +24,10 @@ class Plot(pg.PlotWidget):
         self.setMenuEnabled(False)
         self.hideButtons()
         self._cursor = None
+        # drawn tracks by name, with the track, its deck and its item
+        self._items = {}
+        # maximum absolute sample value the tracks are normalized with
+        self._max_value = None
 
         self.scene().sigMouseClicked.connect(self.mouse_clicked)
 
@@ -33,59 +37,94 @@ class Plot(pg.PlotWidget):
             x = self.getViewBox().mapSceneToView(evt.pos()).x()
             self.sig_mouse_clicked.emit(x)
 
-    def update(self, mix):
+    def update(self, mix, start=0, stop=None):
         """Updates the plot according to the properties of the mix to plot.
+        Tracks are only drawn again if they are new, reach into the segments
+        whose positions have changed, or have to be moved to another deck.
+
+        Parameters
+        ----------
+        mix : :class:`Mix`
+            The mix to plot.
+        start : int, optional
+            The index of the first segment whose position has changed.
+        stop : int, optional
+            The index of the segment after the last changed segment.
 
         """
 
         mix.lock()
 
-        # clear the currently depicted plot
-        self.clear()
-
         tracks = [(name, track) for name, track in mix.tracks.items()
                   if track.position + track.num_segments <= mix.times.size - 1]
+        # get maximum absolute sample value for normalization
+        max_value = None
         if len(tracks) > 0:
-            # get maximum absolute sample value for normalization
             max_value = max(np.abs(track.audio).max()
                             for name, track in tracks)
+        if start == 0 or max_value != self._max_value:
+            # clear the currently depicted plot
+            self.clear()
+            self._items.clear()
+            self._cursor = None
+            self._max_value = max_value
+
+        tracks.sort(key=lambda x: x[1].position)
+
+        decks = []
+        names = set()
+        for name, track in tracks:
+            # sort tracks in 'smallest' decks possible
+            deck = 0
+            while True:
+                if deck >= len(decks):
+                    # use a new deck
+                    decks.append(track.position + track.num_segments)
+                    break
+                elif track.position > decks[deck]:
+                    decks[deck] = track.position + track.num_segments
+                    break
+                deck += 1
+
+            names.add(name)
+            drawn = self._items.get(name)
+            if drawn is not None:
+                if (drawn[0] is track and drawn[1] == deck
+                        and track.position + track.num_segments <= start):
+                    continue
+                drawn[2].remove(self)
+            self._items[name] = (track, deck,
+                                 self._draw(mix, track, deck, name))
+
+        for name in set(self._items) - names:
+            self._items.pop(name)[2].remove(self)
 
-            tracks.sort(key=lambda x: x[1].position)
-
-            decks = []
-            for name, track in tracks:
-                # sort tracks in 'smallest' decks possible
-                deck = 0
-                while True:
-                    if deck >= len(decks):
-                        # use a new deck
-                        decks.append(track.position + track.num_segments)
-                        break
-                    elif track.position > decks[deck]:
-                        decks[deck] = track.position + track.num_segments
-                        break
-                    deck += 1
-
-                x_offset = mix.times[track.position]
-                # mix audio to mono and normalize it
-                y = track.display / max_value
-                # calculate sample rates for x
-                sample_rates = np.empty(y.size)
-                for i in range(track.num_segments):
-                    sample_rate = track.num_samples(
-                        i) / mix.length(track.to_global(i))
-                    start = track.sample_indeces[i]
-                    stop = track.sample_indeces[i + 1]
-                    sample_rates[start:stop] = 1 / sample_rate
-                x = np.cumsum(sample_rates)
-                # draw the track
-                TrackItem(self, x + x_offset, y[:x.size], deck, name)
-
-            # add the cursor
-            self._cursor = Cursor(self, mix.times[-1])
+        if len(tracks) > 0:
+            # add the cursor or extend its range
+            if self._cursor is None:
+                self._cursor = Cursor(self, mix.times[-1])
+            else:
+                self._cursor.setBounds((0, mix.times[-1]))
 
         mix.unlock()
 
+    def _draw(self, mix, track, deck, name):
+        """Draws a track of the mix into a deck."""
+        x_offset = mix.times[track.position]
+        # mix audio to mono and normalize it
+        y = track.display / self._max_value
+        # calculate sample rates for x
+        sample_rates = np.empty(y.size)
+        for i in range(track.num_segments):
+            sample_rate = track.num_samples(
+                i) / mix.length(track.to_global(i))
+            start = track.sample_indeces[i]
+            stop = track.sample_indeces[i + 1]
+            sample_rates[start:stop] = 1 / sample_rate
+        x = np.cumsum(sample_rates)
+        # draw the track
+        return TrackItem(self, x + x_offset, y[:x.size], deck, name)
+
     def move_cursor(self, dx):
         """Move cursor by specified distance."""
         if self._cursor is not None:
@@ -46,6 +46,7 @@ class TrackItem:
         rectangle.setPen(pg.mkPen('w', width=1))
         rectangle.setBrush(pg.mkBrush('r'))
         plot.addItem(rectangle)
+        self._items = [rectangle]
 
         # draw waveform
         item = SpecialItem(
@@ -55,9 +56,17 @@ class TrackItem:
             antialias=self.antialiasing
         )
         plot.addItem(item)
+        self._items.append(item)
 
         # draw name if provided
         if name is not None:
             text = pg.TextItem(name, anchor=(0, 1), color='w')
             text.setPos(pos_x, pos_y + height)
             plot.addItem(text)
+            self._items.append(text)
+
+    def remove(self, plot):
+        """Removes the track from the plot."""
+        for item in self._items:
+            plot.removeItem(item)
+        self._items.clear()
@@ -0,0 +1,114 @@
+"""Compares the equalizer engine with equalizing a track segment by segment,
+as done previously, on a 10-minute stereo track. Coefficients are computed
+and the filters applied in both cases. The equalization either changes in
+steps only or also in gradual transitions, where the gains change with
+every segment.
+
+Run with ``python benchmarks/equalizer.py``.
+
+"""
+
+import numpy as np
+from scipy import signal
+import time
+
+from adapta.model.automation import Equalizer
+from adapta.model.data import Audio
+from adapta.util import db_to_ratio
+
+
+# duration of the track in seconds
+DURATION = 600
+# tempo of the track in bpm
+BPM = 128
+SAMPLE_RATE = 44100
+# equalization nodes, with transitions to the following node
+TRANSITIONS = [['0', '0', '0', '0'],
+               ['64', '-6', '0', '0', 'linear'],
+               ['128', '-20', '0', '3'],
+               ['320', '0', '0', '0', 'leftexp'],
+               ['448', '3', '-2', '0'],
+               ['640', '0', '0', '-6', 'linear'],
+               ['896', '-12', '0', '0'],
+               ['1024', '0', '0', '0']]
+STEPS = [node[:4] for node in TRANSITIONS]
+REPEATS = 5
+
+
+class _Track:
+    """Audio split into segments of equal length, one per beat."""
+
+    def __init__(self, audio, num_segments):
+        self.audio = audio
+        self.num_segments = num_segments
+        self.sample_indeces = np.round(
+            np.linspace(0, audio.shape[0], num_segments + 1)).astype(int)
+
+    def num_samples(self, start, stop=None):
+        if stop is None:
+            stop = start + 1
+        return self.sample_indeces[stop] - self.sample_indeces[start]
+
+
+def per_segment(track, params):
+    """Equalizes a track by computing the coefficients of each segment and
+    filtering each segment on its own.
+
+    """
+
+    envelope = Equalizer(track).envelope(params)
+    gains = envelope(envelope.start, envelope.stop).astype(np.float64)
+    f_s = track.audio.sample_rate
+    zi = np.zeros((2, 2, track.audio.num_channels))
+    result = np.empty(track.audio.shape, dtype=track.audio.dtype)
+    for index, (bass, mid, treble) in enumerate(gains):
+        start, stop = track.sample_indeces[index:index + 2]
+        low = Equalizer.low_shelf(
+            *Equalizer.intermediate(f_s, 1000, bass - mid))
+        high = Equalizer.high_shelf(
+            *Equalizer.intermediate(f_s, 8000, treble - mid))
+        samples = track.audio[start:stop] * db_to_ratio(mid)
+        result[start:stop], zi = signal.sosfilt(
+            np.stack((low, high)), samples, 0, zi)
+    return result
+
+
+def engine(track, params):
+    """Equalizes a track with the equalizer engine."""
+    Equalizer._cache.clear()
+    equalizer = Equalizer(track)
+    equalizer.load(params)
+    result = np.array(track.audio)
+    equalizer.apply(result, 0, track.num_segments)
+    return result
+
+
+def measure(function, *args):
+    """Best time of several runs in seconds."""
+    best = None
+    for _ in range(REPEATS):
+        begin = time.perf_counter()
+        function(*args)
+        elapsed = time.perf_counter() - begin
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main():
+    rng = np.random.default_rng(0)
+    samples = rng.standard_normal((DURATION * SAMPLE_RATE, 2)) * 0.1
+    audio = Audio(samples.astype(np.float32), sample_rate=SAMPLE_RATE)
+    track = _Track(audio, DURATION * BPM // 60)
+    print('{} s stereo track with {} segments'.format(
+        DURATION, track.num_segments))
+    print('{:<12} {:>12} {:>12} {:>8}'.format(
+        'changes', 'per segment', 'engine', 'speedup'))
+    for name, params in (('steps', STEPS), ('transitions', TRANSITIONS)):
+        previous = measure(per_segment, track, params)
+        current = measure(engine, track, params)
+        print('{:<12} {:>10.3f} s {:>10.3f} s {:>7.2f}x'.format(
+            name, previous, current, previous / current))
+
+
+if __name__ == '__main__':
+    main()
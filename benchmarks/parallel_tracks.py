@@ -0,0 +1,121 @@
+"""Compares stretching the tracks of a segment serially with stretching them
+in parallel, for mixes of one, two and four decks playing at once. Each deck
+plays a track at its own tempo, and the median time the mix takes to render
+a segment is measured with either stretching method, taking the best of
+several runs.
+
+Run with ``python benchmarks/parallel_tracks.py``.
+
+"""
+
+import json
+import numpy as np
+import os
+from pyqtgraph.Qt import QtCore
+import tempfile
+import time
+import wave
+
+from adapta.model.data import Mix
+from adapta.util import load
+
+
+# number of segments rendered per measurement
+NUM_SEGMENTS = 40
+# tempo of the mix in bpm
+BPM = 120
+SAMPLE_RATE = 44100
+DECKS = [1, 2, 4]
+REPEATS = 3
+
+
+def write_mix(directory, num_decks):
+    """Writes a mix of decks playing noise from its start, with tempos
+    slightly above the tempo of the mix, and returns the path of the mix
+    file.
+
+    """
+
+    rng = np.random.default_rng(0)
+    num_beats = NUM_SEGMENTS + 8
+    tracks = {}
+    for deck in range(num_decks):
+        name = 'deck{}'.format(deck)
+        period = 60 / (BPM + 1 + deck)
+        num_frames = round(num_beats * period * SAMPLE_RATE)
+        samples = rng.standard_normal((num_frames, 2)) * 0.05 * 32767
+        with wave.open(os.path.join(directory, name + '.wav'), 'wb') as file:
+            file.setnchannels(2)
+            file.setsampwidth(2)
+            file.setframerate(SAMPLE_RATE)
+            file.writeframes(samples.astype('<i2').tobytes())
+        np.savetxt(os.path.join(directory, name + '.beats'),
+                   np.arange(num_beats) * period)
+        tracks[name] = {'audio': name + '.wav', 'beats': name + '.beats'}
+    with open(os.path.join(directory, 'automation.txt'), 'w') as file:
+        file.write('Tempo\n0 deck0 {}\n'.format(BPM))
+    path = os.path.join(directory, 'mix.json')
+    with open(path, 'w') as file:
+        json.dump({'automation': 'automation.txt', 'tracks': tracks}, file)
+    return path
+
+
+def render(path):
+    """Loads a mix, renders its segments in order and returns the median
+    latency in seconds and the segments.
+
+    """
+
+    mix = Mix()
+    mix.load(path)
+    # the tracks are prepared in worker threads
+    while mix.num_segments < NUM_SEGMENTS:
+        QtCore.QCoreApplication.processEvents()
+        time.sleep(0.01)
+    latencies = []
+    segments = []
+    for index in range(NUM_SEGMENTS):
+        begin = time.perf_counter()
+        segments.append(mix.segment(index))
+        latencies.append(time.perf_counter() - begin)
+    return np.median(latencies), segments
+
+
+def main():
+    application = QtCore.QCoreApplication([])
+    # keep the decoded noise out of the persistent audio cache
+    load({'AudioCache': {'enabled': False}})
+    print('{:<10} {:>6} {:>10} {:>10} {:>8}'.format(
+        'stretcher', 'decks', 'serial', 'parallel', 'speedup'))
+    with tempfile.TemporaryDirectory() as directory:
+        paths = {}
+        for num_decks in DECKS:
+            paths[num_decks] = os.path.join(directory, str(num_decks))
+            os.mkdir(paths[num_decks])
+            paths[num_decks] = write_mix(paths[num_decks], num_decks)
+        for use_resampling in (True, False):
+            name = 'resampler' if use_resampling else 'wsola'
+            for num_decks in DECKS:
+                # alternate the methods, so that both are equally affected
+                # by the load of the machine
+                latencies = {False: [], True: []}
+                results = []
+                for _ in range(REPEATS):
+                    for parallel_tracks in (False, True):
+                        load({'Mix': {'use_resampling': use_resampling,
+                                      'parallel_tracks': parallel_tracks}})
+                        latency, segments = render(paths[num_decks])
+                        latencies[parallel_tracks].append(latency)
+                        results.append(segments)
+                assert all(np.array_equal(a, b) for segments in results[1:]
+                           for a, b in zip(results[0], segments))
+                serial = min(latencies[False])
+                parallel = min(latencies[True])
+                print('{:<10} {:>6} {:>7.1f} ms {:>7.1f} ms {:>7.2f}x'.format(
+                    name, num_decks, 1e3 * serial, 1e3 * parallel,
+                    serial / parallel))
+    application.quit()
+
+
+if __name__ == '__main__':
+    main()
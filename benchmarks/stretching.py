@@ -0,0 +1,36 @@
+"""Reports the real-time factor of the stretchers, the duration of the
+stretched audio divided by the time spent stretching it, on a minute of
+stereo noise at several ratios of output to input length.
+
+Run with ``python benchmarks/stretching.py``.
+
+"""
+
+import numpy as np
+
+from adapta.model.data import Audio
+from adapta.model.stretching import real_time_factor, Resampler, Wsola
+
+
+# duration of the audio in seconds
+DURATION = 60
+SAMPLE_RATE = 44100
+RATIOS = [0.8, 0.95, 1.0, 1.05, 1.25]
+
+
+def main():
+    rng = np.random.default_rng(0)
+    samples = rng.standard_normal((DURATION * SAMPLE_RATE, 2)) * 0.1
+    audio = Audio(samples.astype(np.float32), sample_rate=SAMPLE_RATE)
+    print('{:<10} {}'.format('ratio', ' '.join(
+        '{:>8}'.format(ratio) for ratio in RATIOS)))
+    for cls in (Resampler, Wsola):
+        stretcher = cls(SAMPLE_RATE, 2, np.float32)
+        factors = [real_time_factor(stretcher, audio, ratio)
+                   for ratio in RATIOS]
+        print('{:<10} {}'.format(cls.__name__.lower(), ' '.join(
+            '{:>7.0f}x'.format(factor) for factor in factors)))
+
+
+if __name__ == '__main__':
+    main()
@@ -5,13 +5,13 @@ setup(
     version="1.0.0",
     packages=find_packages(),
     package_data={'': ['*.json', '*.svg']},
-    entry_points={'gui_scripts': ['adapta = adapta.__main__:main']},
+    entry_points={'gui_scripts': ['adapta = adapta.__main__:main'],
+                  'console_scripts': ['adapta-cache = adapta.cache:main']},
     setup_requires=['numpy>=1.16.4',
                     'scipy>=1.3.0',
                     'cython>=0.29.10',
                     'madmom>=0.16.1',
                     'pyaudio>=0.2.11',
-                    'pyrubberband>=0.3.0',
                     'pyqt5>=5.12.2',
                     'pyqtgraph>=0.10.0'],
     install_requires=['numpy>=1.16.4',
@@ -19,7 +19,6 @@ setup(
                       'cython>=0.29.10',
                       'madmom>=0.16.1',
                       'pyaudio>=0.2.11',
-                      'pyrubberband>=0.3.0',
                       'pyqt5>=5.12.2',
                       'pyqtgraph>=0.10.0'],
     author="Jakob Nagel",
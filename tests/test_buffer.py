@@ -0,0 +1,194 @@
+"""Stress tests of the ring buffer with a producer and a consumer running in
+different threads.
+
+"""
+
+import numpy as np
+import pytest
+import queue
+import random
+import sys
+import threading
+import time
+
+from adapta.model.playback import Buffer
+from adapta.util import dump, load
+
+
+# duration of each concurrent test in seconds
+DURATION = 2
+# interpreter switch interval in seconds, short to provoke races
+SWITCH_INTERVAL = 1e-5
+# values are positions modulo this number
+PERIOD = 32768
+
+
+@pytest.fixture(autouse=True)
+def settings():
+    previous = dump()
+    load({'Buffer': {'length': 0.1, 'mirror': 4096, 'warnings': False}})
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(SWITCH_INTERVAL)
+    yield
+    sys.setswitchinterval(interval)
+    load(previous)
+
+
+def _values(position, num_values, offset=0):
+    return (np.arange(position, position + num_values) + offset) % PERIOD
+
+
+def _join(views):
+    return np.concatenate(views) if len(views) > 1 else views[0]
+
+
+def _run(*functions):
+    """Runs functions in threads until the duration has passed or one of
+    them signals to stop. The functions get the stop event and return
+    nothing.
+
+    """
+
+    stop = threading.Event()
+    threads = [threading.Thread(target=function, args=(stop, ))
+               for function in functions]
+    for thread in threads:
+        thread.start()
+    stop.wait(DURATION)
+    stop.set()
+    for thread in threads:
+        thread.join()
+
+
+def test_wrap_around():
+    buffer = Buffer()
+    rng = random.Random(0)
+    position = 0
+    wrapped = 0
+    while position < 10 * buffer.capacity:
+        num_values = rng.randint(1, buffer.free)
+        buffer.reserve(num_values).write(
+            _values(buffer.written, num_values))
+        buffer.commit(num_values)
+        num_values = rng.randint(1, buffer.filled)
+        views = buffer.read(num_values)
+        index = position % buffer.capacity
+        if index + num_values > buffer.capacity:
+            wrapped += 1
+            # reads wrapping around within the mirror are contiguous
+            if index + num_values <= buffer.capacity + buffer.mirror:
+                assert len(views) == 1
+            else:
+                assert len(views) == 2
+        np.testing.assert_array_equal(
+            _join(views), _values(position, num_values))
+        buffer.release(num_values)
+        position += num_values
+    assert wrapped > 0
+    assert buffer.released == position
+
+
+def test_concurrent_resize():
+    buffer = Buffer()
+    errors = []
+    capacities = set()
+    requests = queue.Queue()
+    done = {}
+
+    def writer(stop):
+        # writes reservations, which may be moved meanwhile
+        while not stop.is_set():
+            try:
+                position, num_values, reservation = requests.get(
+                    timeout=0.01)
+            except queue.Empty:
+                continue
+            time.sleep(0)
+            reservation.write(_values(position, num_values))
+            done[position] = num_values
+
+    def producer(stop):
+        rng = random.Random(1)
+        pending = []
+        while not stop.is_set():
+            while pending and pending[0][0] in done:
+                position, num_values = pending.pop(0)
+                del done[position]
+                buffer.commit(num_values)
+            if len(pending) < 8:
+                num_values = rng.randint(1, 20000)
+                if buffer.grow(num_values):
+                    position = buffer.written + buffer.reserved
+                    requests.put((position, num_values,
+                                  buffer.reserve(num_values)))
+                    pending.append((position, num_values))
+            choice = rng.random()
+            if choice < 0.02:
+                buffer.resize(buffer.filled + buffer.reserved
+                              + rng.randint(0, 50000))
+            elif choice < 0.1:
+                buffer.shrink()
+            capacities.add(buffer.capacity)
+            time.sleep(0)
+
+    def consumer(stop):
+        rng = random.Random(2)
+        while not stop.is_set():
+            position = buffer.released
+            views = buffer.read(rng.randint(1, 8000))
+            values = _join(views).copy()
+            time.sleep(0)
+            # held values neither change nor miss a resize
+            if (not np.array_equal(_join(views), values)
+                    or not np.array_equal(
+                        values, _values(position, values.shape[0]))):
+                errors.append(position)
+                stop.set()
+            buffer.release(values.shape[0])
+
+    _run(writer, producer, consumer)
+    assert errors == []
+    assert buffer.released > 0
+    assert len(capacities) > 1
+
+
+def test_concurrent_truncate():
+    buffer = Buffer()
+    errors = []
+    truncations = [0]
+
+    def producer(stop):
+        rng = random.Random(1)
+        while not stop.is_set():
+            num_values = rng.randint(1, 30000)
+            if not buffer.grow(num_values):
+                time.sleep(0.0005)
+                continue
+            position = buffer.written + buffer.reserved
+            # rewritten values differ from the truncated ones
+            buffer.reserve(num_values).write(
+                _values(position, num_values, 100 * truncations[0]))
+            buffer.commit(num_values)
+            if rng.random() < 0.05:
+                buffer.truncate(rng.randint(0, buffer.filled + 1))
+                truncations[0] += 1
+            elif rng.random() < 0.05:
+                buffer.shrink()
+
+    def consumer(stop):
+        rng = random.Random(2)
+        while not stop.is_set():
+            position = buffer.released
+            views = buffer.read(rng.randint(1, 8000))
+            values = _join(views).copy()
+            time.sleep(0)
+            # values being read are kept by truncations
+            if not np.array_equal(_join(views), values):
+                errors.append(position)
+                stop.set()
+            buffer.release(values.shape[0])
+
+    _run(producer, consumer)
+    assert errors == []
+    assert buffer.released > 0
+    assert truncations[0] > 0
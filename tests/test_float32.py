@@ -0,0 +1,117 @@
+"""Tests that the segment path processes float32 samples without float64
+temporaries.
+
+"""
+
+import numpy as np
+import pytest
+import tracemalloc
+
+from adapta.model.data import Audio, AudioCache, Track
+from adapta.model.stretching import Resampler, Wsola
+
+
+SAMPLE_RATE = 44100
+# beat period of the track in seconds
+BEAT = 0.5
+NUM_BEATS = 64
+AUTOMATION = """Volume
+0 0
+16 -6 linear
+32 -20 rightexp
+48 0
+
+Equalizer
+0 0 -12 0 leftexp
+8 0 0 12 linear
+16 0 0 0
+"""
+
+
+class _Mix:
+    """Mono output format of the mix, which tracks are decoded to."""
+
+    sample_rate = SAMPLE_RATE
+    num_channels = 1
+
+    def lock(self):
+        pass
+
+    def unlock(self):
+        pass
+
+
+@pytest.fixture
+def track(tmp_path, monkeypatch):
+    rng = np.random.default_rng(0)
+    samples = rng.standard_normal(NUM_BEATS * round(BEAT * SAMPLE_RATE))
+    audio = Audio((samples * 0.1).astype(np.float32),
+                  sample_rate=SAMPLE_RATE)
+    monkeypatch.setattr(AudioCache, 'load', lambda *args: audio)
+    automation = tmp_path / 'automation.txt'
+    automation.write_text(AUTOMATION)
+    track = Track(_Mix(), {'audio': str(tmp_path / 'audio.wav'),
+                           'automation': str(automation)})
+    track.init(np.arange(NUM_BEATS) * BEAT)
+    return track
+
+
+def _peak(function, *args):
+    """Calls a function and returns its result and the peak of the memory
+    allocated meanwhile in bytes.
+
+    """
+
+    tracemalloc.start()
+    try:
+        result = function(*args)
+        return result, tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def test_segments(track):
+    # fill the caches of the effects
+    for index in range(track.num_segments):
+        track.segments(index)
+    for index in range(track.num_segments):
+        segment, peak = _peak(track.segments, index)
+        assert segment.dtype == np.float32
+        # a float64 temporary of the samples alone takes twice as much memory
+        # as the segment
+        assert peak < 4 * segment.nbytes
+
+
+@pytest.mark.parametrize('cls', [Resampler, Wsola])
+@pytest.mark.parametrize('ratio', [0.75, 1, 1.5])
+def test_stretching(track, cls, ratio):
+    stretcher = cls(SAMPLE_RATE, 1, np.float32)
+    fetched = 0
+    for index in range(track.num_segments // 2):
+        num_input = track.num_samples(index)
+        num_output = round(num_input * ratio)
+        while not stretcher.ready(num_input, num_output):
+            stretcher.feed(track.segments(fetched))
+            fetched += 1
+        assert stretcher.process(num_input, num_output).dtype == np.float32
+
+
+def test_rescale():
+    samples = np.arange(-2 ** 15, 2 ** 15, dtype=np.int16)
+    audio = Audio(samples, sample_rate=SAMPLE_RATE)
+    result, peak = _peak(audio.rescale, np.float32)
+    assert result.dtype == np.float32
+    assert peak < 2 * result.nbytes
+
+
+@pytest.mark.parametrize('dtype', [np.int16, np.int32])
+def test_rescale_full_scale(dtype):
+    audio = Audio(np.array([1, -1, 0.5], dtype=np.float32),
+                  sample_rate=SAMPLE_RATE)
+    result = audio.rescale(dtype)
+    maximum = np.iinfo(dtype).max
+    assert result.dtype == dtype
+    # full scale samples do not wrap around
+    assert result[0] > 0.99 * maximum
+    assert result[1] < -0.99 * maximum
+    assert abs(result[2] - maximum / 2) < 1e-6 * maximum + 1